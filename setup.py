@@ -1,4 +1,21 @@
+import sys
 from distutils.core import setup
+from distutils.command.build_py import build_py
+
+
+class BuildPy(build_py):
+
+    """Leaves out the asyncio support module, which is a syntax error before Python 3.5."""
+
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 5):
+            modules = [
+                (module_package, module, filename)
+                for module_package, module, filename in modules
+                if (module_package, module) != ("optimizations", "_async")
+            ]
+        return modules
 
 
 setup(
@@ -15,6 +32,9 @@ setup(
         "optimizations.management",
         "optimizations.management.commands",
     ],
+    cmdclass = {
+        "build_py": BuildPy,
+    },
     package_dir = {
         "": "src",
     },
@@ -6,7 +6,10 @@ Developed by Dave Hall.
 <http://www.etianen.com/>
 """
 
-from optimizations.propertycache import cached_property
+
+VERSION = (1, 0, 4)
+
+from optimizations.propertycache import cached_property, cached_attribute, timed_cached_property, shared_cached_property, clear_cached_properties, prefetch_cached_property
 from optimizations.assetcache import default_asset_cache
 from optimizations.thumbnailcache import default_thumbnail_cache
 from optimizations.stylesheetcache import default_stylesheet_cache
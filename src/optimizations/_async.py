@@ -0,0 +1,182 @@
+"""
+Asyncio support for the asset caches.
+
+This module requires Python 3.5+, and is only imported by the async
+methods of the asset caches. Blocking work, such as hashing, storage access
+and PIL, is run in the default executor. External commands are run using
+asyncio subprocesses.
+"""
+from __future__ import unicode_literals
+
+import asyncio, time
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import six
+from django.utils.encoding import force_bytes
+
+from optimizations.assetcache import AdaptiveAsset
+from optimizations.minifiers import get_minifier, MinifierError, JS, CSS
+from optimizations.utils import atomic_write, save_file
+
+
+def run_in_executor(func, *args, **kwargs):
+    """Returns an awaitable that runs the given blocking function in the default executor."""
+    return asyncio.get_event_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+
+async def communicate(args, input=None):
+    """Runs the given command, returning a tuple of (returncode, stdoutdata, stderrdata)."""
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin = asyncio.subprocess.PIPE,
+        stdout = asyncio.subprocess.PIPE,
+        stderr = asyncio.subprocess.PIPE
+    )
+    stdoutdata, stderrdata = await process.communicate(input)
+    return process.returncode, stdoutdata, stderrdata
+
+
+class AtomicWrite(object):
+
+    """An async context manager that runs atomic_write in the default executor."""
+
+    def __init__(self, path):
+        """Initializes the atomic write."""
+        self._context = atomic_write(path)
+
+    async def __aenter__(self):
+        return await run_in_executor(self._context.__enter__)
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        return await run_in_executor(self._context.__exit__, exc_type, exc_value, traceback)
+
+
+# Asset cache.
+
+async def aget_name_and_meta(asset_cache, asset):
+    """Returns the name and associated parameters of an asset."""
+    asset_cache_key, name_and_meta = await run_in_executor(asset_cache._lookup, asset)
+    if name_and_meta is None:
+        name, meta, needs_save = await run_in_executor(asset_cache._prepare_save, asset)
+        # Save the file to the asset cache.
+        if needs_save:
+            start = time.time()
+            await asset.asave(asset_cache._storage, name, meta)
+            await run_in_executor(asset_cache._finish_save, asset, name, time.time() - start)
+        # Cache the name.
+        name_and_meta = (name, meta)
+        await run_in_executor(asset_cache._cache.set, asset_cache_key, name_and_meta)
+    await run_in_executor(asset_cache._log_access, name_and_meta[0], asset)
+    return name_and_meta
+
+
+async def aget_url(asset_cache, asset, force_save):
+    """Returns the cached url of the given asset."""
+    if force_save is None:
+        force_save = not settings.DEBUG
+    asset = AdaptiveAsset(asset)
+    if not force_save:
+        try:
+            return asset.get_url()
+        except NotImplementedError:
+            pass
+    name, _ = await aget_name_and_meta(asset_cache, asset)
+    return asset_cache._storage.url(name)
+
+
+# Thumbnail cache.
+
+async def aget_thumbnail(asset_cache, thumbnail_asset):
+    """Returns a generated thumbnail for the given thumbnail asset."""
+    from optimizations.thumbnailcache import Thumbnail
+    name_and_meta = await aget_name_and_meta(asset_cache, thumbnail_asset)
+    return Thumbnail(asset_cache, thumbnail_asset, name_and_meta)
+
+
+# Video cache.
+
+async def asave_video(video_asset, storage, name, meta):
+    """Saves the given video asset, running ffmpeg asynchronously."""
+    from optimizations.videocache import get_duration_command, parse_duration
+    input_path = await run_in_executor(video_asset._get_input_path)
+    output_path = await run_in_executor(video_asset._get_output_path, storage, name)
+    if video_asset._needs_duration():
+        _, stdoutdata, stderrdata = await communicate(get_duration_command(input_path))
+        duration = parse_duration(stdoutdata, stderrdata)
+    else:
+        duration = None
+    # Generate the video, atomically renaming it into place.
+    async with AtomicWrite(output_path) as temp_path:
+        returncode, stdoutdata, stderrdata = await communicate(video_asset._get_command(input_path, temp_path, duration))
+        video_asset._check_result(returncode, stdoutdata, stderrdata)
+
+
+# Minifiers.
+
+async def aminify_command(minifier, source, type):
+    """Minifies the given source bytes using the command of the given minifier."""
+    try:
+        returncode, stdoutdata, stderrdata = await communicate(minifier.get_command(type), source)
+    except OSError as ex:
+        raise MinifierError("Could not run minifier.", str(ex))
+    # Check it all worked.
+    if returncode != 0:
+        raise MinifierError("Error while minifying {type}.".format(type=type), stderrdata)
+    return stdoutdata
+
+
+async def acompile_javascript(compiler, source, force_compile):
+    """Compiles the given javascript source code."""
+    from optimizations.javascriptcompiler import JavascriptError
+    if force_compile is None:
+        force_compile = not settings.DEBUG
+    # Convert to string.
+    if isinstance(source, six.string_types):
+        source = source.encode("utf-8")
+    # Don't compile in debug mode.
+    if not force_compile:
+        return source
+    # Check for previously-compiled source.
+    minifier = get_minifier(compiler._minifier)
+    cache_key = compiler.get_cache_key(source, minifier)
+    compiled_source = await run_in_executor(compiler._cache.get, cache_key)
+    if compiled_source is None:
+        # Compile the source.
+        try:
+            compiled_source = await minifier.aminify(source, JS)
+        except MinifierError as ex:
+            raise JavascriptError("Error while compiling javascript.", ex.detail_message)
+        await run_in_executor(compiler._cache.set, cache_key, compiled_source)
+    return compiled_source
+
+
+async def asave_javascript(javascript_asset, storage, name, meta):
+    """Saves the given javascript asset, running the compiler asynchronously."""
+    from optimizations.javascriptcompiler import default_javascript_compiler
+    if not javascript_asset._compile:
+        return await run_in_executor(javascript_asset.save, storage, name, meta)
+    compiled_parts = []
+    for asset in javascript_asset._assets:
+        contents = await run_in_executor(asset.get_contents)
+        compiled_parts.append(await default_javascript_compiler.acompile(contents, force_compile=True))
+    compiled_contents = force_bytes(javascript_asset.join_str).join(compiled_parts)
+    if javascript_asset._rescope:
+        compiled_contents = b"(function(window){" + compiled_contents + b"}(window));"
+    # Write the output.
+    await run_in_executor(save_file, storage, name, ContentFile(compiled_contents))
+
+
+async def asave_stylesheet(stylesheet_asset, storage, name, meta):
+    """Saves the given stylesheet asset, running the compressor asynchronously."""
+    from optimizations.stylesheetcache import StylesheetError
+    contents = await run_in_executor(stylesheet_asset._get_uncompiled_contents)
+    if stylesheet_asset._compile:
+        # Compress the content.
+        try:
+            contents = await get_minifier().aminify(contents, CSS)
+        except MinifierError as ex:
+            raise StylesheetError("Error while compiling stylesheets.", ex.detail_message)
+    # Write the output.
+    await run_in_executor(save_file, storage, name, ContentFile(contents))
@@ -9,9 +9,20 @@ a short expiry header to a server with an extremely long expiry header.
 """
 from __future__ import unicode_literals
 
-import hashlib, os.path, fnmatch, re
+import hashlib, os.path, fnmatch, re, gzip, json, time
 from abc import ABCMeta, abstractmethod
 from contextlib import closing
+from io import BytesIO
+
+try:
+    from django.utils.six.moves.urllib.parse import urlparse, unquote
+except ImportError:
+    from six.moves.urllib.parse import urlparse, unquote
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 from django.contrib.staticfiles.finders import find as find_static_path, get_finders
 from django.contrib.staticfiles import storage
@@ -19,25 +30,29 @@ from django.core.files.base import File, ContentFile
 from django.core.files.storage import default_storage
 from django.conf import settings
 from django.core.files.storage import get_storage_class
+from django.core.exceptions import ImproperlyConfigured
 from django.utils import six
 from django.utils.encoding import force_bytes
+from django.utils.functional import LazyObject, empty
 
 try:
     staticfiles_storage = storage.staticfiles_storage
 except AttributeError:
     staticfiles_storage = get_storage_class(settings.STATICFILES_STORAGE)()  # Django 1.3 compatibility.
 
-from optimizations.utils import resolve_namespaced_cache
+import optimizations
+
+from optimizations.signals import asset_cache_lookup, asset_saved
+from optimizations.utils import resolve_namespaced_cache, get_storage_path, save_file, copy_file, atomic_write
 
 
 def freeze_dict(params):
     """Returns an invariant version of the dictionary, suitable for hashing."""
+    # String interpolation of the sorted (key, value) tuples is considerably faster than
+    # str.format, and gives identical output.
     return hashlib.sha1("&".join(
-        "{key}={value}".format(
-            key = key,
-            value = value,
-        )
-        for key, value in sorted(six.iteritems(params))
+        "%s=%s" % item
+        for item in sorted(six.iteritems(params))
     ).encode('utf-8')).hexdigest()
 
 
@@ -98,17 +113,32 @@ class Asset(six.with_metaclass(ABCMeta)):
         return params
 
     def get_id(self):
-        """Returns a globally unique id for this asset."""
-        return freeze_dict(self._get_and_check_id_params())
+        """
+        Returns a globally unique id for this asset.
+
+        The id is calculated once, and memoized on the asset.
+        """
+        asset_id = getattr(self, "_id_cache", None)
+        if asset_id is None:
+            asset_id = freeze_dict(self._get_and_check_id_params())
+            self._id_cache = asset_id
+        return asset_id
 
     def get_cache_key(self):
         return "optimizations:assetcache:{id}".format(
             id = self.get_id(),
         )
 
+    def get_recipe(self):
+        """
+        Returns a JSON-serializable dict that can be passed to load_recipe to
+        recreate this asset, for warming the asset cache.
+        """
+        raise NotImplementedError("This asset cannot be recreated from a recipe.")
+
     def open(self):
         """Returns an open File for this asset."""
-        return File(open(self.get_path()), "rb")
+        return File(open(self.get_path(), "rb"))
 
     def get_contents(self):
         """Returns the contents of this asset as a string."""
@@ -126,8 +156,19 @@ class Asset(six.with_metaclass(ABCMeta)):
         return params
 
     def get_hash(self):
-        """Returns the sha1 hash of this asset's contents."""
-        return freeze_dict(self.get_hash_params())
+        """
+        Returns the sha1 hash of this asset's contents.
+
+        Outside of debug mode, the hash is calculated once, and memoized on the
+        asset. In debug mode, changes to the asset are picked up immediately.
+        """
+        if settings.DEBUG:
+            return freeze_dict(self.get_hash_params())
+        asset_hash = getattr(self, "_hash_cache", None)
+        if asset_hash is None:
+            asset_hash = freeze_dict(self.get_hash_params())
+            self._hash_cache = asset_hash
+        return asset_hash
 
     def get_save_meta(self):
         """Returns the meta parameters to associate with the asset in the asset cache."""
@@ -140,8 +181,28 @@ class Asset(six.with_metaclass(ABCMeta)):
 
     def save(self, storage, name, meta):
         """Saves this asset to the given storage."""
+        # If both the asset and the storage are local, copy the file without reading it into Python.
+        try:
+            path = self.get_path()
+        except NotImplementedError:
+            path = None
+        if path is not None and os.path.isfile(path):
+            storage_path = get_storage_path(storage, name)
+            if storage_path is not None:
+                copy_file(path, storage_path)
+                return
         with closing(self.open()) as handle:
-            storage.save(name, handle)
+            save_file(storage, name, handle)
+
+    def asave(self, storage, name, meta):
+        """
+        Returns an awaitable that saves this asset to the given storage.
+
+        By default, the blocking save is run in an executor. Assets that spawn
+        subprocesses can override this to run them asynchronously.
+        """
+        from optimizations._async import run_in_executor
+        return run_in_executor(self.save, storage, name, meta)
 
 
 class StaticAsset(Asset):
@@ -246,6 +307,13 @@ class StaticAsset(Asset):
         """Returns the path of this static asset."""
         return StaticAsset.get_static_path(self._name)
 
+    def get_recipe(self):
+        """Returns a recipe for recreating this asset."""
+        return {
+            "type": "static",
+            "name": self._name,
+        }
+
     def get_url(self):
         """Returns the URL of this static asset."""
         return staticfiles_storage.url(self._name)
@@ -295,6 +363,48 @@ class FileAsset(Asset):
         self._file.open("rb")
         return self._file
 
+    def get_recipe(self):
+        """Returns a recipe for recreating this asset. Only files in the default storage are supported."""
+        if getattr(self._file, "storage", None) is not default_storage:
+            return super(FileAsset, self).get_recipe()
+        return {
+            "type": "file",
+            "name": self._file.name,
+        }
+
+
+class _StorageFile(File):
+
+    """A file in a storage, with the same path and url as a model file field."""
+
+    def __init__(self, storage, name):
+        """Initializes the storage file."""
+        super(_StorageFile, self).__init__(None, name)
+        self.storage = storage
+
+    @property
+    def path(self):
+        """Returns the path of the file."""
+        return self.storage.path(self.name)
+
+    @property
+    def url(self):
+        """Returns the url of the file."""
+        return self.storage.url(self.name)
+
+    def open(self, mode="rb"):
+        """Opens the file."""
+        if self.file is None or self.file.closed:
+            self.file = self.storage.open(self.name, mode)
+        else:
+            self.file.seek(0)
+        return self
+
+    def close(self):
+        """Closes the file."""
+        if self.file is not None:
+            self.file.close()
+
 
 class GroupedAsset(Asset):
 
@@ -312,19 +422,10 @@ class GroupedAsset(Asset):
 
     def get_id_params(self):
         """"Returns the params which should be used to generate the id."""
-        params = {}
-        # Add in the assets.
-        for n, asset in enumerate(self._assets):
-            params.update(
-                ("{n}_{key}".format(
-                    n = n,
-                    key = key,
-                ), value)
-                for key, value
-                in six.iteritems(asset._get_and_check_id_params())
-            )
-        # All done.
-        return params
+        # The ids of the sub-assets are memoized, so this is cheap for long-lived assets.
+        return {
+            "assets": ",".join(asset.get_id() for asset in self._assets),
+        }
 
     def get_mtime(self):
         """Returns the modified time for this asset."""
@@ -358,41 +459,446 @@ class AdaptiveAsset(Asset):
         raise TypeError("{!r} is not a valid asset".format(asset))
 
 
+# Asset recipes.
+
+_recipe_loaders = {}
+
+
+def register_recipe_loader(type, loader):
+    """Registers a function that recreates an asset from a recipe of the given type."""
+    _recipe_loaders[type] = loader
+
+
+def load_recipe(recipe):
+    """Recreates the asset described by the given recipe."""
+    try:
+        loader = _recipe_loaders[recipe["type"]]
+    except KeyError:
+        raise ValueError("{recipe!r} is not a valid asset recipe.".format(recipe=recipe))
+    return loader(recipe)
+
+
+register_recipe_loader("static", lambda recipe: StaticAsset(recipe["name"]))
+register_recipe_loader("file", lambda recipe: FileAsset(_StorageFile(default_storage, recipe["name"])))
+
+
+# File extensions that benefit from precompression.
+COMPRESSIBLE_EXTENSIONS = frozenset((
+    ".css",
+    ".eot",
+    ".htm",
+    ".html",
+    ".ico",
+    ".js",
+    ".json",
+    ".map",
+    ".otf",
+    ".svg",
+    ".ttf",
+    ".txt",
+    ".xml",
+))
+
+
+def compress_gzip(contents, level):
+    """Compresses the given bytes with gzip, reproducibly."""
+    buffer = BytesIO()
+    with closing(gzip.GzipFile(filename="", mode="wb", compresslevel=level, fileobj=buffer, mtime=0)) as handle:
+        handle.write(contents)
+    return buffer.getvalue()
+
+
+def compress_brotli(contents, level):
+    """Compresses the given bytes with brotli."""
+    return brotli.compress(contents, quality=level)
+
+
+# Precompression formats, as a mapping of format to (extension, compress function).
+_compressors = {
+    "gzip": (".gz", compress_gzip),
+    "br": (".br", compress_brotli),
+}
+
+
+# Names are written to the access log at most once per interval, per process.
+ACCESS_LOG_INTERVAL = 24 * 60 * 60
+
+
+# The default number of seconds before the index of known names is reloaded.
+INDEX_TTL = 60 * 60
+
+
+def format_access_log_line(timestamp, name, recipe):
+    """Formats a line of the asset cache access log."""
+    return "{timestamp} {name} {recipe}\n".format(
+        timestamp = timestamp,
+        name = name,
+        recipe = recipe,
+    )
+
+
+def read_access_log(path):
+    """
+    Reads the asset cache access log at the given path, returning a dict of
+    name to (timestamp, recipe) of the last time each name was looked up.
+
+    The recipe is a JSON string, or empty if the asset has no recipe.
+    """
+    accessed_names = {}
+    if os.path.exists(path):
+        with open(path, "r") as handle:
+            for line in handle:
+                parts = line.rstrip("\n").split(" ", 2)
+                try:
+                    timestamp = int(parts[0])
+                    name = parts[1]
+                except (ValueError, IndexError):
+                    continue  # Partially written line.
+                recipe = len(parts) > 2 and parts[2] or ""
+                if name and timestamp > accessed_names.get(name, (0, ""))[0]:
+                    accessed_names[name] = (timestamp, recipe)
+    return accessed_names
+
+
+def _unwrap_storage(storage):
+    """Returns the storage wrapped by a lazy storage, such as default_storage, or the storage itself."""
+    if isinstance(storage, LazyObject):
+        if storage._wrapped is empty:
+            storage._setup()
+        return storage._wrapped
+    return storage
+
+
 class AssetCache(object):
 
     """A cache of assets."""
 
-    def __init__(self, storage=default_storage, prefix="assets", cache_name="optimizations.assetcache"):
-        """Initializes the asset cache."""
+    def __init__(self, storage=default_storage, prefix="assets", cache_name="optimizations.assetcache", precompress=None, index_path=None, access_log_path=None, key_prefix=None, key_version=None, index_ttl=None):
+        """
+        Initializes the asset cache.
+
+        Precompress is a dict of format to compression level. For each format,
+        a precompressed copy of compressible assets is written alongside the
+        asset, for use by a front proxy. If not given, the
+        OPTIMIZATIONS_PRECOMPRESS setting is used. Supported formats are
+        "gzip" and "br". Brotli compression requires the brotli library.
+
+        Names known to exist in the storage are remembered, so the storage
+        is only checked once per name. If index_path is given, or the
+        OPTIMIZATIONS_ASSET_CACHE_INDEX setting is set, then known names are
+        also persisted to that local file, and shared between processes.
+        The index is reloaded every index_ttl seconds, or the
+        OPTIMIZATIONS_ASSET_CACHE_INDEX_TTL setting, defaulting to an hour.
+        Until then, names deleted by another process are still known, so a
+        cache miss for them returns the URL of a missing file.
+
+        If access_log_path is given, or the OPTIMIZATIONS_ASSET_CACHE_ACCESS_LOG
+        setting is set, then names looked up in the asset cache are appended
+        to that local file, with a timestamp. The access log is used by the
+        cleanassets management command to find unused files.
+
+        Cache keys are namespaced by the library version, key_version, the
+        storage and the settings that affect saved assets, so changing any of
+        these invalidates the cache. If not given, key_version is read from the
+        OPTIMIZATIONS_ASSET_CACHE_KEY_VERSION setting. Cache keys also start
+        with key_prefix, or the OPTIMIZATIONS_ASSET_CACHE_KEY_PREFIX setting,
+        so that environments can safely share a cache.
+        """
         self._storage = storage
         self._prefix = prefix
         self._cache = resolve_namespaced_cache(cache_name)
+        if index_path is None:
+            index_path = getattr(settings, "OPTIMIZATIONS_ASSET_CACHE_INDEX", None)
+        self._index_path = index_path
+        if index_ttl is None:
+            index_ttl = getattr(settings, "OPTIMIZATIONS_ASSET_CACHE_INDEX_TTL", INDEX_TTL)
+        self._index_ttl = index_ttl
+        self._known_names = None
+        self._known_names_time = 0
+        self._removed_names = set()
+        if access_log_path is None:
+            access_log_path = getattr(settings, "OPTIMIZATIONS_ASSET_CACHE_ACCESS_LOG", None)
+        self._access_log_path = access_log_path
+        self._accessed_names = {}
+        if precompress is None:
+            precompress = getattr(settings, "OPTIMIZATIONS_PRECOMPRESS", {})
+        for format in precompress:
+            if format not in _compressors:
+                raise ImproperlyConfigured("{format} is not a valid precompression format. Should be one of {formats}.".format(
+                    format = format,
+                    formats = ", ".join(_compressors.keys()),
+                ))
+            if format == "br" and brotli is None:
+                raise ImproperlyConfigured("Brotli precompression requires the brotli library to be installed.")
+        self._precompress = precompress
+        # Namespace the cache keys.
+        if key_prefix is None:
+            key_prefix = getattr(settings, "OPTIMIZATIONS_ASSET_CACHE_KEY_PREFIX", "")
+        self._key_prefix = key_prefix
+        if key_version is None:
+            key_version = getattr(settings, "OPTIMIZATIONS_ASSET_CACHE_KEY_VERSION", 1)
+        wrapped_storage = _unwrap_storage(storage)
+        self._key_namespace = freeze_dict({
+            "library": ".".join(map(str, optimizations.VERSION)),
+            "version": key_version,
+            "storage": "{module}.{name}".format(
+                module = wrapped_storage.__class__.__module__,
+                name = wrapped_storage.__class__.__name__,
+            ),
+            "storage_url": getattr(wrapped_storage, "base_url", ""),
+            "prefix": prefix,
+            "precompress": json.dumps(precompress, sort_keys=True),
+            "minifier": getattr(settings, "OPTIMIZATIONS_MINIFIER", ""),
+            "minifier_commands": json.dumps(getattr(settings, "OPTIMIZATIONS_MINIFIER_COMMANDS", {}), sort_keys=True),
+        })[:12]
+
+    def _get_known_names(self):
+        """
+        Returns the set of names known to exist in the storage, loading the
+        index on first use.
+
+        The index is reloaded once per index TTL, so names deleted by the
+        cleanassets management command in another process are forgotten.
+        """
+        now = time.time()
+        if self._known_names is None or now - self._known_names_time > self._index_ttl:
+            self._known_names_time = now
+            known_names = set()
+            if self._index_path is not None and os.path.exists(self._index_path):
+                with open(self._index_path, "r") as handle:
+                    known_names.update(line.strip() for line in handle)
+                known_names.discard("")
+            self._known_names = known_names
+        return self._known_names
+
+    def _add_known_names(self, names):
+        """Adds the given names to the index of names known to exist in the storage."""
+        known_names = self._get_known_names()
+        self._removed_names.difference_update(names)
+        new_names = [name for name in names if name not in known_names]
+        if new_names:
+            known_names.update(new_names)
+            if self._index_path is not None:
+                with open(self._index_path, "a") as handle:
+                    handle.write("".join("{name}\n".format(name=name) for name in new_names))
+
+    def _remove_known_names(self, names):
+        """
+        Removes the given names from the index of names known to exist in the storage.
+
+        Cached lookups of the removed names are treated as misses by this
+        process, so the files are saved again if required.
+        """
+        names = set(names)
+        self._removed_names.update(names)
+        known_names = self._get_known_names()
+        known_names.difference_update(names)
+        if self._index_path is not None:
+            with atomic_write(self._index_path) as temp_path:
+                with open(temp_path, "w") as handle:
+                    handle.write("".join("{name}\n".format(name=name) for name in sorted(known_names)))
+
+    def _exists(self, name):
+        """
+        Checks whether the given name exists in the storage.
+
+        Names are content-addressed, so once a name is known to exist, the
+        storage is never checked again.
+        """
+        if name in self._get_known_names():
+            return True
+        if self._storage.exists(name):
+            self._add_known_names((name,))
+            return True
+        return False
+
+    def _list_names(self, path):
+        """Recursively lists all file names in the given storage directory."""
+        dirs, files = self._storage.listdir(path)
+        for file in files:
+            yield "{path}/{file}".format(path=path, file=file)
+        for dir in dirs:
+            for name in self._list_names("{path}/{dir}".format(path=path, dir=dir)):
+                yield name
+
+    def _get_name_from_url(self, url):
+        """Returns the name of the file in the storage with the given URL, or None if the URL is not in the asset cache."""
+        path = urlparse(url).path
+        index = path.rfind("/{prefix}/".format(prefix=self._prefix))
+        if index == -1:
+            return None
+        return unquote(path[index + 1:])
+
+    def seed_index(self):
+        """Adds all names in the asset cache storage to the index of known names."""
+        try:
+            self._add_known_names(list(self._list_names(self._prefix)))
+        except (OSError, NotImplementedError):
+            pass  # The storage is empty, or can't be listed.
+
+    def _log_access(self, name, asset):
+        """
+        Records that the given name has been looked up in the asset cache,
+        along with a recipe for recreating the asset, if it has one.
+        """
+        if self._access_log_path is None:
+            return
+        now = time.time()
+        if now - self._accessed_names.get(name, 0) > ACCESS_LOG_INTERVAL:
+            self._accessed_names[name] = now
+            try:
+                recipe = json.dumps(asset.get_recipe(), sort_keys=True, separators=(",", ":"))
+            except NotImplementedError:
+                recipe = ""
+            with open(self._access_log_path, "a") as handle:
+                handle.write(format_access_log_line(int(now), name, recipe))
+
+    def _log_url_access(self, url, asset):
+        """
+        Records that the given URL of the asset is still in use, without
+        looking it up. URLs that aren't in the asset cache are ignored.
+        """
+        if self._access_log_path is None:
+            return
+        name = self._get_name_from_url(url)
+        if name is not None:
+            self._log_access(name, AdaptiveAsset(asset))
+
+    def _read_access_log(self):
+        """Returns a dict of name to (timestamp, recipe) of the last time it was looked up."""
+        if self._access_log_path is None:
+            return {}
+        return read_access_log(self._access_log_path)
+
+    def get_accessed_names(self, since):
+        """Returns the set of names looked up in the asset cache since the given timestamp."""
+        return set(
+            name
+            for name, (timestamp, _)
+            in six.iteritems(self._read_access_log())
+            if timestamp >= since
+        )
+
+    def compact_access_log(self, since):
+        """Rewrites the access log, keeping only the last lookup of names looked up since the given timestamp."""
+        if self._access_log_path is None:
+            return
+        accessed_names = self._read_access_log()
+        with atomic_write(self._access_log_path) as temp_path:
+            with open(temp_path, "w") as handle:
+                handle.write("".join(
+                    format_access_log_line(timestamp, name, recipe)
+                    for name, (timestamp, recipe)
+                    in sorted(six.iteritems(accessed_names))
+                    if timestamp >= since
+                ))
+
+    def _save_precompressed(self, name):
+        """Saves precompressed copies of the named file, if it is compressible."""
+        _, ext = os.path.splitext(name)
+        if not self._precompress or ext.lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        with closing(self._storage.open(name, "rb")) as handle:
+            contents = handle.read()
+        for format, level in six.iteritems(self._precompress):
+            compressed_ext, compress = _compressors[format]
+            compressed_name = name + compressed_ext
+            if not self._storage.exists(compressed_name):
+                save_file(self._storage, compressed_name, ContentFile(compress(contents, level)))
+
+    def _get_save_name(self, asset):
+        """Generates the storage name of the given asset."""
+        asset_hash = asset.get_hash()
+        asset_ext = asset.get_save_extension()
+        return "{prefix}/{folder}/{hash}{ext}".format(
+            prefix = self._prefix,
+            folder = asset_hash[:2],
+            hash = asset_hash[2:],
+            ext = asset_ext,
+        )
+
+    def _prepare_save(self, asset):
+        """
+        Generates the name and meta of an uncached asset, returning a tuple of
+        (name, meta, needs_save).
+        """
+        # Generate the name.
+        name = self._get_save_name(asset)
+        # Save the asset's params.
+        meta = asset.get_save_meta()
+        return (name, meta, not self._exists(name))
+
+    def _finish_save(self, asset, name, duration):
+        """Precompresses and indexes a newly-saved asset."""
+        self._save_precompressed(name)
+        self._add_known_names((name,))
+        asset_saved.send(asset.__class__, asset=asset, storage=self._storage, name=name, duration=duration)
+
+    def _save_asset(self, asset):
+        """Generates the name and meta of an uncached asset, saving it to storage if required."""
+        name, meta, needs_save = self._prepare_save(asset)
+        # Save the file to the asset cache.
+        if needs_save:
+            start = time.time()
+            asset.save(self._storage, name, meta)
+            self._finish_save(asset, name, time.time() - start)
+        return (name, meta)
+
+    def _lookup(self, asset):
+        """Returns a tuple of (cache key, name and meta) for the given asset. The name and meta are None on a miss."""
+        asset_cache_key = self.get_cache_key(asset)
+        name_and_meta = self._cache.get(asset_cache_key)
+        if name_and_meta is not None and name_and_meta[0] in self._removed_names:
+            name_and_meta = None
+        asset_cache_lookup.send(asset.__class__, asset=asset, hit=name_and_meta is not None)
+        return (asset_cache_key, name_and_meta)
+
+    def get_cache_key(self, asset):
+        """Returns the cache key used to store the name and meta of the given asset."""
+        return "{key_prefix}{asset_cache_key}:{key_namespace}".format(
+            key_prefix = self._key_prefix,
+            asset_cache_key = asset.get_cache_key(),
+            key_namespace = self._key_namespace,
+        )
 
     def get_name_and_meta(self, asset):
         """Returns the name and associated parameters of an asset."""
-        # Get the asset ID.
-        asset_cache_key = asset.get_cache_key()
-        name_and_meta = self._cache.get(asset_cache_key)
+        asset_cache_key, name_and_meta = self._lookup(asset)
         if name_and_meta is None:
-            # Generate the name.
-            asset_hash = asset.get_hash()
-            asset_ext = asset.get_save_extension()
-            name = "{prefix}/{folder}/{hash}{ext}".format(
-                prefix = self._prefix,
-                folder = asset_hash[:2],
-                hash = asset_hash[2:],
-                ext = asset_ext,
-            )
-            # Save the asset's params.
-            meta = asset.get_save_meta()
-            # Save the file to the asset cache.
-            if not self._storage.exists(name):
-                asset.save(self._storage, name, meta)
+            name_and_meta = self._save_asset(asset)
             # Cache the name.
-            name_and_meta = (name, meta)
             self._cache.set(asset_cache_key, name_and_meta)
+        self._log_access(name_and_meta[0], asset)
         return name_and_meta
 
+    def get_names_and_metas(self, assets):
+        """
+        Returns a list of the names and associated parameters of the given assets.
+
+        The cache is queried once for all the assets, and any missing
+        entries are written back in a single batch.
+        """
+        asset_cache_keys = [self.get_cache_key(asset) for asset in assets]
+        cached_names_and_metas = self._cache.get_many(asset_cache_keys)
+        names_and_metas = []
+        missing_names_and_metas = {}
+        for asset, asset_cache_key in zip(assets, asset_cache_keys):
+            name_and_meta = cached_names_and_metas.get(asset_cache_key)
+            if name_and_meta is not None and name_and_meta[0] in self._removed_names:
+                name_and_meta = None
+            asset_cache_lookup.send(asset.__class__, asset=asset, hit=name_and_meta is not None)
+            if name_and_meta is None:
+                name_and_meta = self._save_asset(asset)
+                # Duplicate assets in the batch are only saved once.
+                cached_names_and_metas[asset_cache_key] = name_and_meta
+                missing_names_and_metas[asset_cache_key] = name_and_meta
+            self._log_access(name_and_meta[0], asset)
+            names_and_metas.append(name_and_meta)
+        # Cache the new names.
+        if missing_names_and_metas:
+            self._cache.set_many(missing_names_and_metas)
+        return names_and_metas
+
     def get_name(self, asset):
         """Returns the cached name of the given asset."""
         return self.get_name_and_meta(asset)[0]
@@ -425,6 +931,49 @@ class AssetCache(object):
                 pass
         return self._storage.url(self.get_name(asset))
 
+    def aget_name_and_meta(self, asset):
+        """
+        Returns the name and associated parameters of an asset, without blocking
+        the event loop.
+
+        Requires Python 3.5+.
+        """
+        from optimizations._async import aget_name_and_meta
+        return aget_name_and_meta(self, asset)
+
+    def aget_url(self, asset, force_save=None):
+        """
+        Returns the cached url of the given asset, without blocking the event
+        loop.
+
+        Requires Python 3.5+.
+        """
+        from optimizations._async import aget_url
+        return aget_url(self, asset, force_save)
+
+    def get_urls(self, assets, force_save=None):
+        """Returns the cached urls of the given assets, resolving them as a single batch."""
+        if force_save is None:
+            force_save = not settings.DEBUG
+        assets = [AdaptiveAsset(asset) for asset in assets]
+        urls = [None] * len(assets)
+        # Use the original URLs, if allowed.
+        pending = []
+        for n, asset in enumerate(assets):
+            if not force_save:
+                try:
+                    urls[n] = asset.get_url()
+                    continue
+                except NotImplementedError:
+                    pass
+            pending.append(n)
+        # Resolve the remaining assets in one go.
+        if pending:
+            names_and_metas = self.get_names_and_metas([assets[n] for n in pending])
+            for n, (name, _) in zip(pending, names_and_metas):
+                urls[n] = self._storage.url(name)
+        return urls
+
 
 # The default asset cache.
 default_asset_cache = AssetCache()
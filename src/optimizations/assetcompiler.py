@@ -1,11 +1,13 @@
 """A programmatic compiler of static assets."""
 from __future__ import unicode_literals
 
-import abc
+import abc, json, os.path
 
 from django.utils import six
 
-from optimizations.assetcache import StaticAsset
+from optimizations.assetcache import default_asset_cache, StaticAsset, freeze_dict
+from optimizations.assetmanifest import get_manifest_key
+from optimizations.utils import atomic_write
 
 
 class AssetCompilerPluginRegistrationError(Exception):
@@ -21,9 +23,55 @@ class AssetCompilerPluginBase(six.with_metaclass(abc.ABCMeta)):
     
     @abc.abstractmethod
     def compile_assets(self, assets):
-        """Compiles the given assets."""
+        """Compiles the given assets, returning a list of the compiled URLs."""
         raise NotImplementedError
 
+    def get_asset_cache(self):
+        """Returns the asset cache that the compiled assets are saved to."""
+        return default_asset_cache
+
+    def get_build_params(self, assets):
+        """
+        Returns the params that affect the compiled output of the given assets.
+
+        The compiled output is only rebuilt by an incremental compile if these
+        change. By default, this is the plugin class, the storage, prefix and
+        key settings of the asset cache, and the name and contents of each
+        asset.
+        """
+        params = {
+            "plugin": "{module}.{name}".format(
+                module = self.__class__.__module__,
+                name = self.__class__.__name__,
+            ),
+            "asset_cache": self.get_asset_cache()._key_namespace,
+        }
+        for n, asset in enumerate(assets):
+            params["asset_{n}".format(n=n)] = "{name}:{md5}".format(
+                name = asset.get_name(),
+                md5 = asset.get_contents_hash(),
+            )
+        return params
+
+    def check_outputs(self, urls):
+        """
+        Checks that the given compiled URLs still exist in the asset cache
+        storage. Missing files are removed from the index of the asset cache, so
+        that they are saved again by the next compile.
+        """
+        asset_cache = self.get_asset_cache()
+        missing_names = []
+        for url in urls:
+            name = asset_cache._get_name_from_url(url)
+            if name is None:
+                continue  # Not in the asset cache.
+            if not asset_cache._storage.exists(name):
+                missing_names.append(name)
+        if missing_names:
+            asset_cache._remove_known_names(missing_names)
+            return False
+        return True
+
 
 class AssetCompiler(object):
     
@@ -56,16 +104,62 @@ class AssetCompiler(object):
     
     # Compilation.
     
-    def compile_iter(self, namespace="default"):
-        """Iterates over all assets in the given namespace, compiling as it goes."""
+    def compile_iter(self, namespace="default", manifest=None, build_state=None, dry_run=False):
+        """
+        Iterates over all assets in the given namespace, compiling as it goes.
+
+        If manifest is a dict, then the compiled URLs are added to it.
+
+        If build_state is a dict, then the compile is incremental. Assets whose
+        build params match the build state, and whose compiled output still
+        exists, are not recompiled, and are not yielded. The build state is
+        updated with newly compiled assets.
+
+        If dry_run is True, then the assets that would be compiled are
+        yielded, but not compiled.
+        """
         for plugin_name, plugin in six.iteritems(self._plugins):
             assets = StaticAsset.load(plugin_name, namespace)
-            plugin.compile_assets(assets)
+            key = get_manifest_key(plugin_name, namespace)
+            if build_state is not None:
+                digest = freeze_dict(plugin.get_build_params(assets))
+                state = build_state.get(key)
+                if state is not None and state["digest"] == digest and plugin.check_outputs(state["urls"] or ()):
+                    # The compiled output is up to date.
+                    if manifest is not None and state["urls"] is not None:
+                        manifest[key] = state["urls"]
+                    continue
+            if not dry_run:
+                urls = plugin.compile_assets(assets)
+                if urls is not None:
+                    urls = list(urls)
+                if manifest is not None and urls is not None:
+                    manifest[key] = urls
+                if build_state is not None:
+                    build_state[key] = {
+                        "digest": digest,
+                        "urls": urls,
+                    }
             yield plugin, assets
     
-    def compile(self, namespace="default"):
+    def compile(self, namespace="default", manifest=None, build_state=None):
         """Compiles all assets in the given namespace."""
-        return list(self.compile_iter(namespace))
+        return list(self.compile_iter(namespace, manifest, build_state))
+
+
+def load_build_state(path):
+    """Loads the incremental build state from the given path."""
+    if os.path.exists(path):
+        with open(path, "r") as handle:
+            return json.load(handle)
+    return {}
+
+
+def save_build_state(path, build_state):
+    """Atomically writes the incremental build state to the given path."""
+    with atomic_write(path) as temp_path:
+        with open(temp_path, "w") as handle:
+            json.dump(build_state, handle, indent=4, sort_keys=True)
 
 
 # A shared, global asset compiler.
@@ -0,0 +1,91 @@
+"""
+A manifest of compiled static asset URLs.
+
+The compileassets management command writes the final bundle URLs for each
+static asset namespace to a JSON file, given by the
+OPTIMIZATIONS_ASSET_MANIFEST setting. In production, the asset template tags
+read bundle URLs from the manifest, avoiding hashing and cache access
+during requests.
+"""
+from __future__ import unicode_literals
+
+import json, os.path
+
+from django.conf import settings
+from django.utils import six
+
+from optimizations.utils import atomic_write
+
+
+def get_manifest_key(type, namespace):
+    """Returns the manifest key for the given asset type and namespace."""
+    return "{type}:{namespace}".format(
+        type = type,
+        namespace = namespace,
+    )
+
+
+class AssetManifest(object):
+
+    """A manifest of compiled static asset URLs."""
+
+    def __init__(self, path=None):
+        """
+        Initializes the asset manifest.
+
+        If path is not given, the OPTIMIZATIONS_ASSET_MANIFEST setting is used.
+        """
+        self._path = path
+        self._urls = None
+
+    def get_path(self):
+        """Returns the path of the manifest file, or None if no manifest is configured."""
+        if self._path is None:
+            return getattr(settings, "OPTIMIZATIONS_ASSET_MANIFEST", None)
+        return self._path
+
+    def _load(self):
+        """Loads the manifest into memory, on first use."""
+        if self._urls is None:
+            urls = {}
+            path = self.get_path()
+            if path is not None and os.path.exists(path):
+                with open(path, "r") as handle:
+                    urls = json.load(handle)
+            self._urls = urls
+        return self._urls
+
+    def get_urls(self, type, namespaces):
+        """
+        Returns the compiled URLs for the given asset type and namespaces, or None
+        if they are not in the manifest.
+
+        Only single namespaces are compiled into the manifest, and the manifest
+        is not used in debug mode.
+        """
+        if settings.DEBUG:
+            return None
+        if isinstance(namespaces, six.string_types):
+            namespaces = (namespaces,)
+        if len(namespaces) != 1 or not isinstance(namespaces[0], six.string_types):
+            return None
+        return self._load().get(get_manifest_key(type, namespaces[0]))
+
+    def save(self, urls):
+        """Writes the given dict of manifest key to URLs to the manifest file."""
+        path = self.get_path()
+        if path is None:
+            raise ValueError("No asset manifest path has been configured.")
+        # Write the file atomically, so running processes never see a partial manifest.
+        with atomic_write(path) as temp_path:
+            with open(temp_path, "w") as handle:
+                json.dump(urls, handle, indent=4, sort_keys=True)
+        self._urls = urls
+
+    def clear(self):
+        """Clears the in-memory manifest, so it will be reloaded on next use."""
+        self._urls = None
+
+
+# The default asset manifest.
+default_asset_manifest = AssetManifest()
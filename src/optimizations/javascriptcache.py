@@ -3,10 +3,13 @@ from __future__ import unicode_literals
 
 from django.conf import settings
 from django.core.files.base import ContentFile
+from django.utils.encoding import force_bytes
 
 from optimizations.assetcache import default_asset_cache, GroupedAsset, AdaptiveAsset
 from optimizations.assetcompiler import default_asset_compiler, AssetCompilerPluginBase
 from optimizations.javascriptcompiler import default_javascript_compiler
+from optimizations.minifiers import get_minifier
+from optimizations.utils import save_file
 
 
 class JavascriptAsset(GroupedAsset):
@@ -31,15 +34,23 @@ class JavascriptAsset(GroupedAsset):
     def save(self, storage, name, meta):
         """Saves this asset to the given storage."""
         if self._compile:
-            contents = self.get_contents()
+            # Compile each file separately, so unchanged files can be fetched from the compiler cache.
+            compiled_contents = force_bytes(self.join_str).join(
+                default_javascript_compiler.compile(asset.get_contents(), force_compile=True)
+                for asset in self._assets
+            )
             if self._rescope:
-                contents = "(function(window){%s}(window));" % contents
-            compiled_contents = default_javascript_compiler.compile(contents, force_compile=True)
+                compiled_contents = b"(function(window){" + compiled_contents + b"}(window));"
             # Write the output.
-            storage.save(name, ContentFile(compiled_contents))
+            save_file(storage, name, ContentFile(compiled_contents))
         else:
             # Just save the joined code.
             super(JavascriptAsset, self).save(storage, name, meta)
+
+    def asave(self, storage, name, meta):
+        """Returns an awaitable that saves this asset, running the compiler asynchronously."""
+        from optimizations._async import asave_javascript
+        return asave_javascript(self, storage, name, meta)
             
             
 class JavascriptCache(object):
@@ -78,8 +89,18 @@ class JavascriptAssetCompilerPlugin(AssetCompilerPluginBase):
         self._javascript_cache = javascript_cache
         
     def compile_assets(self, assets):
-        """Compiles the given javascript assets."""
-        self._javascript_cache.get_urls(assets, force_save=True)
+        """Compiles the given javascript assets, returning a list of the compiled URLs."""
+        return self._javascript_cache.get_urls(assets, force_save=True)
+
+    def get_asset_cache(self):
+        """Returns the asset cache that the compiled assets are saved to."""
+        return self._javascript_cache._asset_cache
+
+    def get_build_params(self, assets):
+        """Returns the params that affect the compiled output of the given assets."""
+        params = super(JavascriptAssetCompilerPlugin, self).get_build_params(assets)
+        params.update(get_minifier().get_id_params())
+        return params
         
 
 default_asset_compiler.register_plugin("js", JavascriptAssetCompilerPlugin())
\ No newline at end of file
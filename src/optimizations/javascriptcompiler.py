@@ -1,31 +1,45 @@
 """A general-purpose javascript compiler."""
 from __future__ import unicode_literals
 
-import os.path, subprocess
+import hashlib
 
 from django.conf import settings
 from django.utils import six
 
-import optimizations
+from optimizations.assetcache import freeze_dict
+from optimizations.minifiers import get_minifier, MinifierError, JS
+from optimizations.utils import resolve_namespaced_cache
 
 
-class JavascriptError(Exception):
+class JavascriptError(MinifierError):
 
     """Something went wrong with javascript compilation."""
 
-    def __init__(self, message, detail_message):
-        """Initializes the javascript error."""
-        super(JavascriptError, self).__init__(message)
-        self.detail_message = detail_message
-
 
 class JavascriptCompiler(object):
 
     """A compiler of javascript code."""
 
-    def __init__(self, cache_name="optimizations.javascriptcompiler"):
-        """Initializes the JavascriptCompiler."""
-        self._compressor_path = os.path.join(os.path.abspath(os.path.dirname(optimizations.__file__)), "resources", "yuicompressor.jar")
+    def __init__(self, cache_name="optimizations.javascriptcompiler", minifier=None):
+        """
+        Initializes the JavascriptCompiler.
+
+        The minifier is the dotted path of a minifier class. If not given,
+        the OPTIMIZATIONS_MINIFIER setting is used.
+
+        Compiled output is cached in the named cache, keyed by a digest of
+        the source code and the minifier options.
+        """
+        self._minifier = minifier
+        self._cache = resolve_namespaced_cache(cache_name)
+
+    def get_cache_key(self, source, minifier):
+        """Returns the cache key for the compiled output of the given source bytes."""
+        digest = hashlib.sha1(source)
+        digest.update(freeze_dict(minifier.get_id_params()).encode("utf-8"))
+        return "optimizations:javascriptcompiler:{digest}".format(
+            digest = digest.hexdigest(),
+        )
 
     def compile(self, source, force_compile=None):
         """Compiles the given javascript source code."""
@@ -37,19 +51,27 @@ class JavascriptCompiler(object):
         # Don't compile in debug mode.
         if not force_compile:
             return source
-        # Compile the source.
-        process = subprocess.Popen(
-            ("java", "-jar", self._compressor_path, "--type", "js", "--charset", "utf-8", "-v"),
-            stdin = subprocess.PIPE,
-            stdout = subprocess.PIPE,
-            stderr = subprocess.PIPE,
-        )
-        stdoutdata, stderrdata = process.communicate(source)
+        # Check for previously-compiled source.
+        minifier = get_minifier(self._minifier)
+        cache_key = self.get_cache_key(source, minifier)
+        compiled_source = self._cache.get(cache_key)
+        if compiled_source is None:
+            # Compile the source.
+            try:
+                compiled_source = minifier.minify(source, JS)
+            except MinifierError as ex:
+                raise JavascriptError("Error while compiling javascript.", ex.detail_message)
+            self._cache.set(cache_key, compiled_source)
+        return compiled_source
+
+    def acompile(self, source, force_compile=None):
+        """
+        Returns an awaitable that compiles the given javascript source code.
 
-        # Check it all worked.
-        if process.returncode != 0:
-            raise JavascriptError("Error while compiling javascript.", stderrdata)
-        return stdoutdata
+        Requires Python 3.5+.
+        """
+        from optimizations._async import acompile_javascript
+        return acompile_javascript(self, source, force_compile)
 
 
 default_javascript_compiler = JavascriptCompiler()
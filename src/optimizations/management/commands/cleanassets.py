@@ -0,0 +1,197 @@
+"""Deletes unused files from the asset cache storage."""
+from __future__ import unicode_literals
+
+import datetime, time
+from contextlib import closing
+from multiprocessing.pool import ThreadPool
+from optparse import make_option
+
+try:
+    from django.utils.six.moves.urllib.parse import urljoin
+except ImportError:
+    from six.moves.urllib.parse import urljoin
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.utils import six
+
+from optimizations.assetcache import default_asset_cache, ACCESS_LOG_INTERVAL, _compressors
+from optimizations.assetmanifest import AssetManifest
+from optimizations.stylesheetcache import tokenize_urls
+
+
+def get_stylesheet_references(asset_cache, names):
+    """
+    Returns the set of asset cache names referenced by url() and @import
+    rules in the given stylesheets, and in any stylesheets they reference.
+    """
+    storage = asset_cache._storage
+    seen_names = set(names)
+    referenced_names = set()
+    pending_names = [name for name in seen_names if name.lower().endswith(".css")]
+    while pending_names:
+        name = pending_names.pop()
+        try:
+            with closing(storage.open(name, "rb")) as handle:
+                source = handle.read().decode("utf-8", "replace")
+        except (OSError, IOError):
+            continue  # Missing, so it references nothing.
+        host_url = storage.url(name)
+        for token in tokenize_urls(source):
+            if not isinstance(token, tuple):
+                continue
+            _, url = token
+            if url.startswith("data:"):
+                continue
+            referenced_name = asset_cache._get_name_from_url(urljoin(host_url, url))
+            if referenced_name is None or referenced_name in seen_names:
+                continue
+            seen_names.add(referenced_name)
+            referenced_names.add(referenced_name)
+            if referenced_name.lower().endswith(".css"):
+                pending_names.append(referenced_name)
+    return referenced_names
+
+
+class Command(NoArgsCommand):
+
+    help = (
+        "Deletes unused files from the asset cache storage. "
+        "Files are in use if they have been looked up in the asset cache within the grace period, "
+        "according to the asset cache access log, are in the asset manifest, "
+        "or are referenced by a live stylesheet. "
+        "The grace period should be longer than the timeout of the asset cache, "
+        "so that no process has a deleted name cached. "
+        "WARNING: every process that serves the site must write to the same access log, "
+        "otherwise files in use by other processes are deleted. "
+        "Pass --shared-access-log to confirm this."
+    )
+
+    option_list = NoArgsCommand.option_list + (
+        make_option("--grace-period",
+            action = "store",
+            dest = "grace_period",
+            default = 7.0,
+            type = "float",
+            help = "The number of days that files must be unused before they are deleted. Defaults to 7.",
+        ),
+        make_option("--manifest",
+            action = "store",
+            dest = "manifest",
+            default = None,
+            help = "The path of the asset manifest. Defaults to the OPTIMIZATIONS_ASSET_MANIFEST setting.",
+        ),
+        make_option("--workers",
+            action = "store",
+            dest = "workers",
+            default = 4,
+            type = "int",
+            help = "The number of files to check and delete in parallel. Defaults to 4.",
+        ),
+        make_option("--batch-size",
+            action = "store",
+            dest = "batch_size",
+            default = 100,
+            type = "int",
+            help = "The number of files handled by each worker at a time. Defaults to 100.",
+        ),
+        make_option("--shared-access-log",
+            action = "store_true",
+            dest = "shared_access_log",
+            default = False,
+            help = "Confirms that every process that serves the site writes to the same access log. Required.",
+        ),
+        make_option("--dry-run",
+            action = "store_true",
+            dest = "dry_run",
+            default = False,
+            help = "Report the files that would be deleted, without deleting them.",
+        ),
+    )
+
+    def handle(self, **options):
+        verbosity = int(options.get("verbosity", 1))
+        dry_run = options.get("dry_run", False)
+        asset_cache = default_asset_cache
+        storage = asset_cache._storage
+        if asset_cache._access_log_path is None:
+            raise CommandError("The OPTIMIZATIONS_ASSET_CACHE_ACCESS_LOG setting is required to find unused assets.")
+        if not options.get("shared_access_log", False):
+            raise CommandError(
+                "Files are only known to be in use if they are in the access log, so every process that serves "
+                "the site must write to the same access log. Pass --shared-access-log to confirm this."
+            )
+        grace_period = options.get("grace_period", 7.0) * 24 * 60 * 60
+        # Each process only logs a name once per access log interval, so the
+        # last log entry of a file in constant use can be an interval old.
+        # Allow another interval as a margin.
+        if grace_period < ACCESS_LOG_INTERVAL * 2:
+            raise CommandError("The grace period must be at least two days.")
+        since = time.time() - grace_period
+        cutoff = datetime.datetime.fromtimestamp(since)
+        # Find the live names.
+        live_names = asset_cache.get_accessed_names(since)
+        for urls in six.itervalues(AssetManifest(options.get("manifest"))._load()):
+            for url in urls or ():
+                name = asset_cache._get_name_from_url(url)
+                if name is not None:
+                    live_names.add(name)
+        # Files referenced by live stylesheets are never looked up themselves.
+        live_names.update(get_stylesheet_references(asset_cache, live_names))
+        # Find unused candidates.
+        compressed_exts = tuple(ext for ext, _ in six.itervalues(_compressors))
+        candidate_names = []
+        for name in asset_cache._list_names(asset_cache._prefix):
+            # Precompressed copies live and die with their asset.
+            base_name = name
+            if name.endswith(compressed_exts):
+                base_name = name.rsplit(".", 1)[0]
+            if base_name in live_names:
+                continue
+            candidate_names.append(name)
+        # Check and delete the candidates in parallel batches.
+        def clean_batch(names):
+            cleaned = []
+            for name in names:
+                try:
+                    if storage.modified_time(name) >= cutoff:
+                        continue
+                    size = storage.size(name)
+                    if not dry_run:
+                        storage.delete(name)
+                except (OSError, IOError):
+                    continue  # Deleted by a concurrent process.
+                cleaned.append((name, size))
+            return cleaned
+        batch_size = max(options.get("batch_size", 100), 1)
+        batches = [
+            candidate_names[n:n + batch_size]
+            for n in range(0, len(candidate_names), batch_size)
+        ]
+        pool = ThreadPool(max(options.get("workers", 4), 1))
+        try:
+            cleaned = [
+                name_and_size
+                for batch in pool.imap_unordered(clean_batch, batches)
+                for name_and_size in batch
+            ]
+        finally:
+            pool.close()
+            pool.join()
+        # Report.
+        if verbosity >= 2:
+            for name, size in sorted(cleaned):
+                self.stdout.write("{action} {name} ({size} bytes)\n".format(
+                    action = dry_run and "Would delete" or "Deleted",
+                    name = name,
+                    size = size,
+                ))
+        if verbosity >= 1:
+            self.stdout.write("{action} {count} unused files, totalling {size} bytes\n".format(
+                action = dry_run and "Would delete" or "Deleted",
+                count = len(cleaned),
+                size = sum(size for _, size in cleaned),
+            ))
+        # Tidy up.
+        if not dry_run:
+            asset_cache._remove_known_names(name for name, _ in cleaned)
+            asset_cache.compact_access_log(since)
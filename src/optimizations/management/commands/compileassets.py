@@ -1,24 +1,61 @@
 """Compiles the stylesheet assets in this project."""
 from __future__ import unicode_literals
 
+from optparse import make_option
+
+from django.conf import settings
 from django.core.management.base import NoArgsCommand
 
 from optimizations.assetcache import StaticAsset
-from optimizations.assetcompiler import default_asset_compiler
+from optimizations.assetcompiler import default_asset_compiler, load_build_state, save_build_state
+from optimizations.assetmanifest import AssetManifest
 
 
 class Command(NoArgsCommand):
     
     help = "Compiles the static assets in this project."
+
+    option_list = NoArgsCommand.option_list + (
+        make_option("--manifest",
+            action = "store",
+            dest = "manifest",
+            default = None,
+            help = "The path to write the asset manifest to. Defaults to the OPTIMIZATIONS_ASSET_MANIFEST setting.",
+        ),
+        make_option("--build-state",
+            action = "store",
+            dest = "build_state",
+            default = None,
+            help = "The path of the incremental build state. Only assets that have changed since the last build are compiled. Defaults to the OPTIMIZATIONS_ASSET_BUILD_STATE setting.",
+        ),
+        make_option("--dry-run",
+            action = "store_true",
+            dest = "dry_run",
+            default = False,
+            help = "List the assets that would be compiled, without compiling them.",
+        ),
+    )
     
     def handle(self, **options):
         verbosity = int(options.get("verbosity", 1))
+        dry_run = options.get("dry_run", False)
+        if dry_run:
+            verbosity = max(verbosity, 2)
+        asset_manifest = AssetManifest(options.get("manifest"))
+        manifest = {}
+        # Load the build state.
+        build_state_path = options.get("build_state") or getattr(settings, "OPTIMIZATIONS_ASSET_BUILD_STATE", None)
+        if build_state_path is None:
+            build_state = None
+        else:
+            build_state = load_build_state(build_state_path)
         # Run the compiler.
         for namespace in StaticAsset.get_namespaces():
             try:
-                for plugin, assets in default_asset_compiler.compile_iter(namespace):
+                for plugin, assets in default_asset_compiler.compile_iter(namespace, manifest, build_state, dry_run):
                     if verbosity >= 2:
-                        self.stdout.write("Compiled {asset_type} assets in {namespace} namespace\n".format(
+                        self.stdout.write("{action} {asset_type} assets in {namespace} namespace\n".format(
+                            action = dry_run and "Would compile" or "Compiled",
                             asset_type = plugin.asset_type,
                             namespace = namespace,
                         ))
@@ -33,4 +70,16 @@ class Command(NoArgsCommand):
                 raise
             else:
                 if verbosity == 1:
-                    self.stdout.write("Compiled assets in {namespace} namespace\n".format(namespace=namespace))
\ No newline at end of file
+                    self.stdout.write("Compiled assets in {namespace} namespace\n".format(namespace=namespace))
+        if dry_run:
+            return
+        # Write the build state.
+        if build_state is not None:
+            save_build_state(build_state_path, build_state)
+            if verbosity >= 1:
+                self.stdout.write("Wrote build state to {path}\n".format(path=build_state_path))
+        # Write the manifest.
+        if asset_manifest.get_path() is not None:
+            asset_manifest.save(manifest)
+            if verbosity >= 1:
+                self.stdout.write("Wrote asset manifest to {path}\n".format(path=asset_manifest.get_path()))
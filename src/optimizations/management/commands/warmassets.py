@@ -0,0 +1,84 @@
+"""Warms the asset cache with recently used assets."""
+from __future__ import unicode_literals
+
+import json, time
+from multiprocessing.pool import ThreadPool
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.utils import six
+
+import optimizations.thumbnailcache, optimizations.videocache  # Register the recipe loaders.
+from optimizations.assetcache import default_asset_cache, read_access_log, load_recipe
+
+
+class Command(NoArgsCommand):
+
+    help = (
+        "Warms the asset cache with recently used assets, according to an asset cache access log. "
+        "Missing thumbnails and videos are generated, and the names of all assets are cached."
+    )
+
+    option_list = NoArgsCommand.option_list + (
+        make_option("--access-log",
+            action = "store",
+            dest = "access_log",
+            default = None,
+            help = "The path of the asset cache access log to replay. Defaults to the OPTIMIZATIONS_ASSET_CACHE_ACCESS_LOG setting.",
+        ),
+        make_option("--since",
+            action = "store",
+            dest = "since",
+            default = 7.0,
+            type = "float",
+            help = "Only replay assets used within this many days. Defaults to 7.",
+        ),
+        make_option("--workers",
+            action = "store",
+            dest = "workers",
+            default = 4,
+            type = "int",
+            help = "The number of assets to warm in parallel. Defaults to 4.",
+        ),
+    )
+
+    def handle(self, **options):
+        verbosity = int(options.get("verbosity", 1))
+        asset_cache = default_asset_cache
+        access_log_path = options.get("access_log") or asset_cache._access_log_path
+        if access_log_path is None:
+            raise CommandError("An asset cache access log is required to warm the asset cache.")
+        since = time.time() - options.get("since", 7.0) * 24 * 60 * 60
+        # Load the recipes.
+        recipes = sorted(set(
+            recipe
+            for timestamp, recipe
+            in six.itervalues(read_access_log(access_log_path))
+            if timestamp >= since and recipe
+        ))
+        # Warm the assets in parallel.
+        def warm_asset(recipe):
+            try:
+                asset_cache.get_name_and_meta(load_recipe(json.loads(recipe)))
+            except Exception as ex:
+                return recipe, ex
+            return recipe, None
+        pool = ThreadPool(max(options.get("workers", 4), 1))
+        try:
+            results = list(pool.imap_unordered(warm_asset, recipes))
+        finally:
+            pool.close()
+            pool.join()
+        # Report.
+        errors = [(recipe, ex) for recipe, ex in results if ex is not None]
+        if verbosity >= 2:
+            for recipe, ex in errors:
+                self.stdout.write("Could not warm {recipe}: {ex}\n".format(
+                    recipe = recipe,
+                    ex = ex,
+                ))
+        if verbosity >= 1:
+            self.stdout.write("Warmed {count} assets, {error_count} failed\n".format(
+                count = len(results) - len(errors),
+                error_count = len(errors),
+            ))
@@ -0,0 +1,212 @@
+"""
+Pluggable metrics for the asset cache.
+
+To record metrics, set the OPTIMIZATIONS_METRICS setting to the dotted path
+of a MetricsBase subclass. Asset lookups, hits, misses, builds, bytes written
+and build times are then recorded for each asset type.
+
+Two backends are provided. StatsDMetrics sends metrics to a StatsD server
+over UDP. PrometheusMetrics keeps metrics in memory, and can be scraped
+using prometheus_metrics_view.
+"""
+from __future__ import unicode_literals
+
+import socket, threading
+from abc import ABCMeta, abstractmethod
+
+try:
+    from importlib import import_module
+except ImportError:
+    from django.utils.importlib import import_module  # Python 2.6 compatibility.
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, Http404
+from django.utils import six
+
+from optimizations.signals import asset_cache_lookup, asset_saved
+
+
+class MetricsBase(six.with_metaclass(ABCMeta)):
+
+    """Base class for metrics backends."""
+
+    @abstractmethod
+    def increment(self, name, asset_type, value=1):
+        """Increments the named counter for the given asset type."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def timing(self, name, asset_type, seconds):
+        """Records the named duration for the given asset type."""
+        raise NotImplementedError
+
+
+class StatsDMetrics(MetricsBase):
+
+    """
+    A metrics backend that sends metrics to a StatsD server.
+
+    The server is given by the OPTIMIZATIONS_STATSD_HOST and
+    OPTIMIZATIONS_STATSD_PORT settings, and metric names are prefixed with
+    the OPTIMIZATIONS_STATSD_PREFIX setting.
+    """
+
+    def __init__(self):
+        """Initializes the StatsD metrics."""
+        self._address = (
+            getattr(settings, "OPTIMIZATIONS_STATSD_HOST", "localhost"),
+            getattr(settings, "OPTIMIZATIONS_STATSD_PORT", 8125),
+        )
+        self._prefix = getattr(settings, "OPTIMIZATIONS_STATSD_PREFIX", "optimizations")
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, name, asset_type, value, type):
+        """Sends the given metric to the StatsD server."""
+        data = "{prefix}.{name}.{asset_type}:{value}|{type}".format(
+            prefix = self._prefix,
+            name = name,
+            asset_type = asset_type,
+            value = value,
+            type = type,
+        )
+        try:
+            self._socket.sendto(data.encode("utf-8"), self._address)
+        except socket.error:
+            pass  # Metrics are best-effort.
+
+    def increment(self, name, asset_type, value=1):
+        """Increments the named counter for the given asset type."""
+        self._send(name, asset_type, value, "c")
+
+    def timing(self, name, asset_type, seconds):
+        """Records the named duration for the given asset type."""
+        self._send(name, asset_type, int(seconds * 1000), "ms")
+
+
+class PrometheusMetrics(MetricsBase):
+
+    """
+    A metrics backend that keeps metrics in memory, for rendering in the
+    Prometheus text format.
+
+    Metrics are per-process, so each worker process must be scraped.
+    """
+
+    def __init__(self):
+        """Initializes the Prometheus metrics."""
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+
+    def increment(self, name, asset_type, value=1):
+        """Increments the named counter for the given asset type."""
+        key = (name, asset_type)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def timing(self, name, asset_type, seconds):
+        """Records the named duration for the given asset type."""
+        key = (name, asset_type)
+        with self._lock:
+            total, count = self._timings.get(key, (0.0, 0))
+            self._timings[key] = (total + seconds, count + 1)
+
+    def render(self):
+        """Returns the metrics in the Prometheus text format."""
+        with self._lock:
+            counters = sorted(six.iteritems(self._counters))
+            timings = sorted(six.iteritems(self._timings))
+        lines = []
+        last_name = None
+        for (name, asset_type), value in counters:
+            metric_name = "optimizations_{name}_total".format(name=name)
+            if name != last_name:
+                lines.append("# TYPE {metric_name} counter".format(metric_name=metric_name))
+                last_name = name
+            lines.append("{metric_name}{{asset_type=\"{asset_type}\"}} {value}".format(
+                metric_name = metric_name,
+                asset_type = asset_type,
+                value = value,
+            ))
+        last_name = None
+        for (name, asset_type), (total, count) in timings:
+            metric_name = "optimizations_{name}_seconds".format(name=name)
+            if name != last_name:
+                lines.append("# TYPE {metric_name} summary".format(metric_name=metric_name))
+                last_name = name
+            lines.append("{metric_name}_sum{{asset_type=\"{asset_type}\"}} {total!r}".format(
+                metric_name = metric_name,
+                asset_type = asset_type,
+                total = total,
+            ))
+            lines.append("{metric_name}_count{{asset_type=\"{asset_type}\"}} {count}".format(
+                metric_name = metric_name,
+                asset_type = asset_type,
+                count = count,
+            ))
+        return "".join(line + "\n" for line in lines)
+
+
+_metrics = {}
+
+
+def get_metrics(path=None):
+    """
+    Returns the metrics backend for the given dotted class path.
+
+    If no path is given, the OPTIMIZATIONS_METRICS setting is used. If no
+    metrics backend is configured, None is returned.
+    """
+    if path is None:
+        path = getattr(settings, "OPTIMIZATIONS_METRICS", None)
+        if path is None:
+            return None
+    metrics = _metrics.get(path)
+    if metrics is None:
+        module_name, _, class_name = path.rpartition(".")
+        try:
+            metrics_cls = getattr(import_module(module_name), class_name)
+        except (ImportError, AttributeError, ValueError):
+            raise ImproperlyConfigured("{path} is not a valid metrics backend.".format(path=path))
+        metrics = _metrics[path] = metrics_cls()
+    return metrics
+
+
+def record_asset_cache_lookup(sender, asset, hit, **kwargs):
+    """Records an asset cache lookup in the configured metrics backend."""
+    metrics = get_metrics()
+    if metrics is not None:
+        asset_type = sender.__name__
+        metrics.increment("lookups", asset_type)
+        metrics.increment(hit and "hits" or "misses", asset_type)
+
+
+def record_asset_saved(sender, asset, storage, name, duration, **kwargs):
+    """Records an asset build in the configured metrics backend."""
+    metrics = get_metrics()
+    if metrics is not None:
+        asset_type = sender.__name__
+        metrics.increment("builds", asset_type)
+        metrics.timing("build", asset_type, duration)
+        try:
+            size = storage.size(name)
+        except (OSError, NotImplementedError):
+            pass
+        else:
+            metrics.increment("bytes_written", asset_type, size)
+
+
+def connect_metrics():
+    """Connects the asset cache signals to the configured metrics backend."""
+    if getattr(settings, "OPTIMIZATIONS_METRICS", None) is not None:
+        asset_cache_lookup.connect(record_asset_cache_lookup, dispatch_uid="optimizations.metrics")
+        asset_saved.connect(record_asset_saved, dispatch_uid="optimizations.metrics")
+
+
+def prometheus_metrics_view(request):
+    """Renders the metrics in the Prometheus text format, if the PrometheusMetrics backend is configured."""
+    metrics = get_metrics()
+    if not isinstance(metrics, PrometheusMetrics):
+        raise Http404("Prometheus metrics are not configured.")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,189 @@
+"""
+Pluggable minifiers for javascript and stylesheet source code.
+
+The minifier used by django-optimizations can be configured using the
+OPTIMIZATIONS_MINIFIER setting, which should be the dotted path to a
+MinifierBase subclass. The default is the bundled YUI compressor, which
+requires a Java runtime.
+"""
+from __future__ import unicode_literals
+
+import os.path, subprocess
+from abc import ABCMeta, abstractmethod
+
+try:
+    from importlib import import_module
+except ImportError:
+    from django.utils.importlib import import_module  # Python 2.6 compatibility.
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six
+
+import optimizations
+
+
+JS = "js"
+CSS = "css"
+
+
+class MinifierError(Exception):
+
+    """Something went wrong with minification."""
+
+    def __init__(self, message, detail_message):
+        """Initializes the minifier error."""
+        super(MinifierError, self).__init__(message)
+        self.detail_message = detail_message
+
+
+class MinifierBase(six.with_metaclass(ABCMeta)):
+
+    """Base class for minifiers."""
+
+    def get_id_params(self):
+        """Returns the params that affect the output of this minifier."""
+        return {
+            "minifier": "{module}.{name}".format(
+                module = self.__class__.__module__,
+                name = self.__class__.__name__,
+            ),
+        }
+
+    @abstractmethod
+    def minify(self, source, type):
+        """
+        Minifies the given source bytes, returning the minified bytes.
+
+        The type is one of JS or CSS.
+        """
+        raise NotImplementedError
+
+    def aminify(self, source, type):
+        """
+        Returns an awaitable that minifies the given source bytes.
+
+        By default, the blocking minify is run in an executor.
+        """
+        from optimizations._async import run_in_executor
+        return run_in_executor(self.minify, source, type)
+
+
+class CommandMinifier(MinifierBase):
+
+    """
+    A minifier that pipes source code through an external command.
+
+    The commands are a dictionary of type to command arguments. If not
+    given, they're read from the OPTIMIZATIONS_MINIFIER_COMMANDS setting.
+    """
+
+    def __init__(self, commands=None):
+        """Initializes the command minifier."""
+        if commands is None:
+            commands = getattr(settings, "OPTIMIZATIONS_MINIFIER_COMMANDS", {})
+        self._commands = commands
+
+    def get_command(self, type):
+        """Returns the command used to minify the given type."""
+        try:
+            return tuple(self._commands[type])
+        except KeyError:
+            raise MinifierError("No minifier command configured for {type}.".format(type=type), "")
+
+    def get_id_params(self):
+        """Returns the params that affect the output of this minifier."""
+        params = super(CommandMinifier, self).get_id_params()
+        for type, command in six.iteritems(self._commands):
+            params["command_{type}".format(type=type)] = " ".join(command)
+        return params
+
+    def minify(self, source, type):
+        """Minifies the given source bytes using the configured command."""
+        try:
+            process = subprocess.Popen(
+                self.get_command(type),
+                stdin = subprocess.PIPE,
+                stdout = subprocess.PIPE,
+                stderr = subprocess.PIPE,
+            )
+        except OSError as ex:
+            raise MinifierError("Could not run minifier.", str(ex))
+        stdoutdata, stderrdata = process.communicate(source)
+        # Check it all worked.
+        if process.returncode != 0:
+            raise MinifierError("Error while minifying {type}.".format(type=type), stderrdata)
+        return stdoutdata
+
+    def aminify(self, source, type):
+        """Returns an awaitable that minifies the given source bytes, running the command asynchronously."""
+        from optimizations._async import aminify_command
+        return aminify_command(self, source, type)
+
+
+class YUICompressorMinifier(CommandMinifier):
+
+    """A minifier that uses the bundled YUI compressor."""
+
+    def __init__(self):
+        """Initializes the YUI compressor minifier."""
+        compressor_path = os.path.join(os.path.abspath(os.path.dirname(optimizations.__file__)), "resources", "yuicompressor.jar")
+        super(YUICompressorMinifier, self).__init__(dict(
+            (type, ("java", "-jar", compressor_path, "--type", type, "--charset", "utf-8", "-v"))
+            for type in (JS, CSS)
+        ))
+
+    def get_id_params(self):
+        """Returns the params that affect the output of this minifier."""
+        return MinifierBase.get_id_params(self)
+
+
+class RMinifier(MinifierBase):
+
+    """
+    An in-process minifier that uses the rjsmin and rcssmin libraries.
+
+    No external processes are started, so this is considerably faster than
+    the YUI compressor, and doesn't require Java.
+    """
+
+    def __init__(self):
+        """Initializes the in-process minifier."""
+        try:
+            import rjsmin, rcssmin
+        except ImportError:
+            raise ImproperlyConfigured("RMinifier requires the rjsmin and rcssmin libraries to be installed.")
+        self._minifiers = {
+            JS: rjsmin.jsmin,
+            CSS: rcssmin.cssmin,
+        }
+
+    def minify(self, source, type):
+        """Minifies the given source bytes in-process."""
+        try:
+            minifier = self._minifiers[type]
+        except KeyError:
+            raise MinifierError("Cannot minify {type}.".format(type=type), "")
+        return minifier(source.decode("utf-8")).strip().encode("utf-8")
+
+
+_minifiers = {}
+
+
+def get_minifier(path=None):
+    """
+    Returns the minifier instance for the given dotted class path.
+
+    If no path is given, the OPTIMIZATIONS_MINIFIER setting is used.
+    """
+    if path is None:
+        path = getattr(settings, "OPTIMIZATIONS_MINIFIER", "optimizations.minifiers.YUICompressorMinifier")
+    minifier = _minifiers.get(path)
+    if minifier is None:
+        module_name, _, class_name = path.rpartition(".")
+        try:
+            minifier_cls = getattr(import_module(module_name), class_name)
+        except (ImportError, AttributeError, ValueError):
+            raise ImproperlyConfigured("{path} is not a valid minifier.".format(path=path))
+        minifier = _minifiers[path] = minifier_cls()
+    return minifier
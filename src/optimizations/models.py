@@ -1,3 +1,7 @@
 """Models used by django-optimizations."""
 
-# Nothing to see here. This module needs to exist for the testing framework.
\ No newline at end of file
+from optimizations.metrics import connect_metrics
+
+
+# Send asset cache signals to the configured metrics backend.
+connect_metrics()
@@ -6,9 +6,18 @@ property lookups, such as database access, can therefore be sped up
 when accessed multiple times in the same request.
 
 The property can also be safely set and deleted without interference.
+
+The cached_attribute decorator is a faster alternative that stores the value
+in the instance __dict__ under the property name, so that repeat reads never
+call any Python code.
+
+For memoization across requests, timed_cached_property expires values after
+a number of seconds, and shared_cached_property stores values in a Django
+cache, so they can be shared between processes.
 """
 from __future__ import unicode_literals
 
+import threading, time
 from functools import wraps
 
 
@@ -54,7 +63,370 @@ class _CachedProperty(property):
             fdel(obj)
             delattr(obj, self._cache_name)
         return do_fdel
+
+    def _prime_cache(self, obj, value):
+        """Caches the given value on the object."""
+        setattr(obj, self._cache_name, value)
+
+    def _clear_cache(self, obj):
+        """Clears the cached value, if present."""
+        try:
+            delattr(obj, self._cache_name)
+        except AttributeError:
+            pass
                     
                     
 # Public name for the cached property decorator. Using a class as a decorator just looks plain ugly. :P            
-cached_property = _CachedProperty
\ No newline at end of file
+cached_property = _CachedProperty
+
+
+class _CachedAttribute(object):
+
+    """
+    A property who's value is cached in the instance __dict__.
+
+    This is a non-data descriptor, so once the value is cached it shadows
+    the descriptor, and reads are plain attribute lookups. Setting the
+    attribute replaces the cached value, and deleting it clears the cache.
+
+    If lock is True, then the first computation of the value is guarded by a
+    per-instance lock, so concurrent threads will not compute it twice.
+
+    If slot is given, then the value is stored in the named attribute instead
+    of the instance __dict__. This allows use on classes that define
+    __slots__, where the slot should be listed in __slots__. See
+    _SlotCachedAttribute.
+    """
+
+    def __init__(self, fget, lock=False, slot=None):
+        """Initializes the cached attribute."""
+        self._fget = fget
+        self._name = fget.__name__
+        self._lock = lock
+        self._slot = slot
+        self._lock_name = "_{name}_lock".format(
+            name = self._name,
+        )
+        # Used to guard instances without a __dict__ for storing their own lock.
+        self._shared_lock = threading.RLock()
+        self.__doc__ = fget.__doc__
+
+    def _get_cached(self, obj):
+        """Returns the cached value, raising AttributeError if not present."""
+        if self._slot is None:
+            try:
+                return obj.__dict__[self._name]
+            except KeyError:
+                raise AttributeError(self._name)
+        return getattr(obj, self._slot)
+
+    def _set_cached(self, obj, value):
+        """Caches the value on the given instance."""
+        if self._slot is None:
+            obj.__dict__[self._name] = value
+        else:
+            setattr(obj, self._slot, value)
+
+    def _prime_cache(self, obj, value):
+        """Caches the given value on the object."""
+        self._set_cached(obj, value)
+
+    def _clear_cache(self, obj):
+        """Clears the cached value, if present."""
+        if self._slot is None:
+            obj.__dict__.pop(self._name, None)
+        else:
+            try:
+                delattr(obj, self._slot)
+            except AttributeError:
+                pass
+
+    def _get_lock(self, obj):
+        """Returns the lock for the given instance."""
+        obj_dict = getattr(obj, "__dict__", None)
+        if obj_dict is None:
+            return self._shared_lock
+        lock = obj_dict.get(self._lock_name)
+        if lock is None:
+            lock = obj_dict.setdefault(self._lock_name, threading.RLock())
+        return lock
+
+    def _release_lock(self, obj, lock):
+        """
+        Removes the lock from the given instance, so it can still be pickled
+        and copied. Threads already waiting on the lock find the cached value.
+        """
+        obj_dict = getattr(obj, "__dict__", None)
+        if obj_dict is not None and obj_dict.get(self._lock_name) is lock:
+            del obj_dict[self._lock_name]
+
+    def __get__(self, obj, cls=None):
+        """Returns the cached value, generating it if required."""
+        if obj is None:
+            return self
+        if self._slot is not None:
+            try:
+                return getattr(obj, self._slot)
+            except AttributeError:
+                pass
+        if self._lock:
+            lock = self._get_lock(obj)
+            with lock:
+                try:
+                    # Another thread may have generated the value while we were waiting.
+                    try:
+                        return self._get_cached(obj)
+                    except AttributeError:
+                        pass
+                    value = self._fget(obj)
+                    self._set_cached(obj, value)
+                finally:
+                    self._release_lock(obj, lock)
+        else:
+            value = self._fget(obj)
+            self._set_cached(obj, value)
+        return value
+
+
+class _SlotCachedAttribute(_CachedAttribute):
+
+    """
+    A cached attribute who's value is stored in a slot.
+
+    Instances with __slots__ have no __dict__ for the value to shadow the
+    descriptor, so this is a data descriptor, and setting or deleting the
+    attribute sets or clears the slot.
+    """
+
+    def __set__(self, obj, value):
+        """Replaces the cached value."""
+        self._set_cached(obj, value)
+
+    def __delete__(self, obj):
+        """Clears the cached value."""
+        self._clear_cache(obj)
+
+
+def cached_attribute(fget=None, lock=False, slot=None):
+    """
+    Decorator for a property who's value is cached in the instance __dict__.
+
+    Can be used either as @cached_attribute, or with arguments as
+    @cached_attribute(lock=True, slot="_foo_cache").
+    """
+    cls = _CachedAttribute if slot is None else _SlotCachedAttribute
+    if fget is None:
+        return lambda fget: cls(fget, lock=lock, slot=slot)
+    return cls(fget, lock=lock, slot=slot)
+
+
+class _TimedCachedProperty(object):
+
+    """A property who's value is cached on the object for a number of seconds."""
+
+    def __init__(self, fget, ttl):
+        """Initializes the timed cached property."""
+        self._fget = fget
+        self._ttl = ttl
+        self._cache_name = "_{name}_cache".format(
+            name = fget.__name__,
+        )
+        self.__doc__ = fget.__doc__
+
+    def __get__(self, obj, cls=None):
+        """Returns the cached value, generating it if missing or expired."""
+        if obj is None:
+            return self
+        now = time.time()
+        expires_and_value = getattr(obj, self._cache_name, None)
+        if expires_and_value is not None and expires_and_value[0] > now:
+            return expires_and_value[1]
+        # Generate the value to cache.
+        value = self._fget(obj)
+        self._prime_cache(obj, value)
+        return value
+
+    def __set__(self, obj, value):
+        """Caches the given value on the object, for another ttl seconds."""
+        self._prime_cache(obj, value)
+
+    def __delete__(self, obj):
+        """Clears the cached value."""
+        self._clear_cache(obj)
+
+    def _prime_cache(self, obj, value):
+        """Caches the given value on the object."""
+        setattr(obj, self._cache_name, (time.time() + self._ttl, value))
+
+    def _clear_cache(self, obj):
+        """Clears the cached value, if present."""
+        try:
+            delattr(obj, self._cache_name)
+        except AttributeError:
+            pass
+
+
+def timed_cached_property(ttl):
+    """Decorator for a property who's value is cached on the object for ttl seconds."""
+    return lambda fget: _TimedCachedProperty(fget, ttl)
+
+
+class _SharedCachedProperty(object):
+
+    """
+    A property who's value is cached in a Django cache, keyed by the primary
+    key of the object.
+
+    The value is also cached on the object, so it is only fetched from the
+    Django cache once per object. Objects without a primary key are not
+    stored in the Django cache.
+    """
+
+    def __init__(self, fget, cache_name, version, timeout):
+        """Initializes the shared cached property."""
+        self._fget = fget
+        self._name = fget.__name__
+        self._cache_name = "_{name}_cache".format(
+            name = self._name,
+        )
+        self._shared_cache_name = cache_name
+        self._shared_cache = None
+        self._version = version
+        self._timeout = timeout
+        self.__doc__ = fget.__doc__
+
+    def _get_shared_cache(self):
+        """Returns the Django cache, resolving it on first use."""
+        if self._shared_cache is None:
+            from optimizations.utils import resolve_namespaced_cache
+            self._shared_cache = resolve_namespaced_cache(self._shared_cache_name)
+        return self._shared_cache
+
+    def get_cache_key(self, obj):
+        """Returns the shared cache key for the given object."""
+        return "optimizations:propertycache:{module}.{cls}.{name}:{pk}".format(
+            module = obj.__class__.__module__,
+            cls = obj.__class__.__name__,
+            name = self._name,
+            pk = obj.pk,
+        )
+
+    def __get__(self, obj, cls=None):
+        """Returns the cached value, generating it if required."""
+        if obj is None:
+            return self
+        if hasattr(obj, self._cache_name):
+            return getattr(obj, self._cache_name)
+        # Unsaved objects can't be shared.
+        if getattr(obj, "pk", None) is None:
+            value = self._fget(obj)
+        else:
+            shared_cache = self._get_shared_cache()
+            cache_key = self.get_cache_key(obj)
+            # Values are wrapped in a tuple, so that None can be cached.
+            cached_value = shared_cache.get(cache_key, version=self._version)
+            if cached_value is None:
+                value = self._fget(obj)
+                cache_kwargs = {"version": self._version}
+                if self._timeout is not None:
+                    cache_kwargs["timeout"] = self._timeout
+                shared_cache.set(cache_key, (value,), **cache_kwargs)
+            else:
+                value = cached_value[0]
+        setattr(obj, self._cache_name, value)
+        return value
+
+    def __set__(self, obj, value):
+        """Caches the given value on the object, and clears the value in the Django cache."""
+        self._clear_cache(obj)
+        self._prime_cache(obj, value)
+
+    def __delete__(self, obj):
+        """Clears the cached value, both on the object and in the Django cache."""
+        self._clear_cache(obj)
+
+    def _prime_cache(self, obj, value):
+        """Caches the given value on the object."""
+        setattr(obj, self._cache_name, value)
+
+    def _clear_cache(self, obj):
+        """Clears the cached value, both on the object and in the Django cache."""
+        try:
+            delattr(obj, self._cache_name)
+        except AttributeError:
+            pass
+        if getattr(obj, "pk", None) is not None:
+            self._get_shared_cache().delete(self.get_cache_key(obj), version=self._version)
+
+
+def shared_cached_property(cache_name="optimizations.propertycache", version=1, timeout=None):
+    """
+    Decorator for a property who's value is cached in the named Django cache.
+
+    Changing the version invalidates all previously-cached values. If
+    timeout is None, the default timeout of the cache is used.
+    """
+    return lambda fget: _SharedCachedProperty(fget, cache_name, version, timeout)
+
+
+_cached_property_types = (_CachedProperty, _CachedAttribute, _TimedCachedProperty, _SharedCachedProperty)
+
+
+def _get_cached_property(cls, name):
+    """Returns the named cached property descriptor of the given class."""
+    for klass in cls.__mro__:
+        descriptor = vars(klass).get(name)
+        if descriptor is not None:
+            if isinstance(descriptor, _cached_property_types):
+                return descriptor
+            break
+    raise TypeError("{name} is not a cached property of {cls}.".format(
+        name = name,
+        cls = cls.__name__,
+    ))
+
+
+def clear_cached_properties(obj, *names):
+    """
+    Clears the cached values of the given object's cached properties.
+
+    If no names are given, then all cached properties are cleared. Values
+    stored by shared_cached_property are also removed from the Django cache.
+    """
+    cls = obj.__class__
+    if names:
+        descriptors = [_get_cached_property(cls, name) for name in names]
+    else:
+        # Only the first definition of each name counts, since subclasses can shadow cached properties.
+        definitions = {}
+        for klass in cls.__mro__:
+            for name, descriptor in vars(klass).items():
+                definitions.setdefault(name, descriptor)
+        descriptors = [
+            descriptor
+            for descriptor in definitions.values()
+            if isinstance(descriptor, _cached_property_types)
+        ]
+    for descriptor in descriptors:
+        descriptor._clear_cache(obj)
+
+
+def prefetch_cached_property(objs, name, func, default=None):
+    """
+    Fills the named cached property for all the given objects using a single call
+    to func.
+
+    The func is called with a list of the objects, and should return either a
+    sequence of values in the same order, or a dict of object primary key to
+    value. Objects missing from the dict are given the default value.
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+    descriptor = _get_cached_property(objs[0].__class__, name)
+    values = func(objs)
+    if isinstance(values, dict):
+        values = [values.get(obj.pk, default) for obj in objs]
+    for obj, value in zip(objs, values):
+        descriptor._prime_cache(obj, value)
+    return objs
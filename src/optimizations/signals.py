@@ -0,0 +1,20 @@
+"""
+Signals sent by the asset cache.
+
+Both signals are sent with the asset class as the sender, so receivers can
+report per asset type. If no receivers are connected, sending them costs
+almost nothing.
+"""
+from __future__ import unicode_literals
+
+from django.dispatch import Signal
+
+
+# Sent whenever an asset is looked up in the asset cache. The hit argument is
+# False if the asset had to be looked up in storage or saved.
+asset_cache_lookup = Signal(providing_args=("asset", "hit",))
+
+
+# Sent whenever an asset is saved to the asset cache storage. The duration
+# is the time taken to generate and save the asset, in seconds.
+asset_saved = Signal(providing_args=("asset", "storage", "name", "duration",))
@@ -1,43 +1,121 @@
 """A cache of javascipt files, optionally compressed."""
 from __future__ import unicode_literals
 
+import base64
 from contextlib import closing
+import hashlib
 import os.path
 import re
-import subprocess
 
 try:
-    from django.utils.six.moves.urllib.parse import urlparse
+    from django.utils.six.moves.urllib.parse import urljoin, urlparse, urlunparse, quote
 except ImportError:
-    from six.moves.urllib.parse import urlparse
+    from six.moves.urllib.parse import urljoin, urlparse, urlunparse, quote
 
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.utils.encoding import force_bytes
+from django.utils import six
 
-import optimizations
-from optimizations.assetcache import default_asset_cache, GroupedAsset, AdaptiveAsset
+from optimizations.assetcache import default_asset_cache, GroupedAsset, AdaptiveAsset, StaticAsset, staticfiles_storage
 from optimizations.assetcompiler import AssetCompilerPluginBase, default_asset_compiler
+from optimizations.minifiers import get_minifier, MinifierError, CSS
+from optimizations.propertycache import cached_property
+from optimizations.utils import save_file
 
 
-class StylesheetError(Exception):
+class StylesheetError(MinifierError):
 
     """Something went wrong with stylesheet compilation."""
 
-    def __init__(self, message, detail_message):
-        """Initializes the stylesheet error."""
-        super(StylesheetError, self).__init__(message)
-        self.detail_message = detail_message
 
-
-RE_URLS = (
-    re.compile("url\('([^']+)'\)", re.IGNORECASE),
-    re.compile("url\(\"([^\"]+)\"\)", re.IGNORECASE),
-    re.compile("url\(([^\)]+)\)", re.IGNORECASE),
-    re.compile("@import\s*\('([^']+)'\)", re.IGNORECASE),
-    re.compile("@import\s*\(\"([^\"]+)\"\)", re.IGNORECASE),
-    re.compile("@import\s*\(([^\)]+)\)", re.IGNORECASE),
-)
+RE_URL = re.compile(r"""
+    (?P<prefix>@import\s*(?:url)?|url)\(\s*
+    (?:
+        '(?P<single>[^']+)'
+        |"(?P<double>[^"]+)"
+        |(?P<bare>[^\)]+?)
+    )
+    \s*\)
+    |@import\s*
+    (?:
+        '(?P<import_single>[^']+)'
+        |"(?P<import_double>[^"]+)"
+    )
+""", re.IGNORECASE | re.VERBOSE)
+
+
+RE_IMPORT_MEDIA = re.compile(r"\s*([^;{}]*);")
+
+
+def tokenize_urls(source):
+    """
+    Splits the given stylesheet source into a list of literal text and url
+    references.
+
+    Literal text is returned as a string. Url references are returned as a tuple of
+    (is_import, url).
+    """
+    tokens = []
+    pos = 0
+    for match in RE_URL.finditer(source):
+        tokens.append(source[pos:match.start()])
+        prefix = match.group("prefix")
+        tokens.append((
+            prefix is None or prefix[0] == "@",
+            (
+                match.group("single") or match.group("double") or match.group("bare") or
+                match.group("import_single") or match.group("import_double")
+            ).strip(),
+        ))
+        pos = match.end()
+    tokens.append(source[pos:])
+    return tokens
+
+
+def format_url(is_import, url):
+    """Formats a url reference back into stylesheet source."""
+    if is_import:
+        return "@import url({url})".format(
+            url = url,
+        )
+    return "url({url})".format(
+        url = url,
+    )
+
+
+# The types of file that can be inlined as data URIs, keyed by extension.
+DATA_URI_MIMETYPES = {
+    ".gif": "image/gif",
+    ".ico": "image/x-icon",
+    ".jpeg": "image/jpeg",
+    ".jpg": "image/jpeg",
+    ".png": "image/png",
+    ".svg": "image/svg+xml",
+    ".webp": "image/webp",
+    ".eot": "application/vnd.ms-fontobject",
+    ".otf": "font/otf",
+    ".ttf": "font/ttf",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+}
+
+
+def make_data_uri(mimetype, contents):
+    """
+    Returns a data URI for the given file contents.
+
+    SVG files are percent-encoded, since this is smaller than base64 for text.
+    """
+    if mimetype == "image/svg+xml":
+        return "data:{mimetype},{data}".format(
+            mimetype = mimetype,
+            data = quote(contents, safe="/:=;,"),
+        )
+    return "data:{mimetype};base64,{data}".format(
+        mimetype = mimetype,
+        data = base64.b64encode(contents).decode("ascii"),
+    )
 
 
 class StylesheetAsset(GroupedAsset):
@@ -46,61 +124,241 @@ class StylesheetAsset(GroupedAsset):
 
     join_str = "\n"
 
-    def __init__(self, assets, compile):
+    def __init__(self, assets, compile, inline_imports=False, inline_max_size=0):
         """Initializes the asset."""
         super(StylesheetAsset, self).__init__(assets)
         self._compile = compile
+        self._inline_imports = inline_imports
+        self._inline_max_size = inline_max_size
 
     def get_id_params(self):
         """"Returns the params which should be used to generate the id."""
         params = super(StylesheetAsset, self).get_id_params()
         params["compile"] = self._compile
+        params["inline_imports"] = self._inline_imports
+        params["inline_max_size"] = self._inline_max_size
         return params
 
-    def save(self, storage, name, meta):
-        """Saves this asset to the given storage."""
-        file_parts = []
-        # Compile the assets.
+    def get_hash(self):
+        """Returns the sha1 hash of this asset's contents, including any inlined files."""
+        asset_hash = super(StylesheetAsset, self).get_hash()
+        inlined_assets = []
+        if self._inline_imports:
+            _, imported_assets = self._tokens_and_imported_assets
+            inlined_assets.extend(imported_assets)
+        inlined_assets.extend(
+            asset
+            for _, (asset, _)
+            in sorted(six.iteritems(self._data_uri_assets))
+        )
+        if inlined_assets:
+            return hashlib.sha1("".join([asset_hash] + [
+                inlined_asset.get_hash()
+                for inlined_asset
+                in inlined_assets
+            ]).encode("utf-8")).hexdigest()
+        return asset_hash
+
+    def _get_static_name(self, url):
+        """Returns the static name referenced by the given absolute url, or None."""
+        if url.startswith(settings.STATIC_URL):
+            return urlunparse(urlparse(url)[:3] + ("", "", "",))[len(settings.STATIC_URL):]
+        return None
+
+    def _tokenize(self, host_url, source, imported_assets, import_stack):
+        """
+        Tokenizes the given source, resolving relative urls against the host url.
+
+        Returns a tuple of (tokens, imports). If imports are being inlined, then
+        local @import rules are recursively replaced by the tokens of the
+        imported stylesheet, and the imported assets are appended to
+        imported_assets. Cyclic imports are dropped. All other @import rules
+        are removed from the tokens, and returned as a list of (url, media),
+        since browsers ignore @import rules that follow other rules.
+        """
+        source_tokens = tokenize_urls(source)
+        tokens = []
+        imports = []
+        for n, token in enumerate(source_tokens):
+            if isinstance(token, tuple):
+                is_import, url = token
+                url = urljoin(host_url, url)
+                token = (is_import, url)
+                # A literal token always follows a url token.
+                media_match = is_import and self._inline_imports and RE_IMPORT_MEDIA.match(source_tokens[n + 1])
+                if media_match:
+                    media = media_match.group(1).strip()
+                    # Remove the media query and semicolon of the import rule.
+                    source_tokens[n + 1] = source_tokens[n + 1][media_match.end():]
+                    static_name = self._get_static_name(url)
+                    if static_name is not None:
+                        if static_name in import_stack:
+                            continue  # Drop cyclic imports.
+                        imported_asset = StaticAsset(static_name)
+                        try:
+                            with closing(imported_asset.open()) as handle:
+                                imported_source = handle.read().decode("utf-8")
+                        except (IOError, OSError):
+                            pass  # Leave missing imports for the browser to deal with.
+                        else:
+                            nested_assets = [imported_asset]
+                            nested_tokens, nested_imports = self._tokenize(
+                                imported_asset.get_url(),
+                                imported_source,
+                                nested_assets,
+                                import_stack + (static_name,),
+                            )
+                            # Nested imports with their own media query can't be hoisted out of a media
+                            # query, so leave the whole import for the browser to deal with.
+                            if not media or not any(nested_media for _, nested_media in nested_imports):
+                                imported_assets.extend(nested_assets)
+                                imports.extend(
+                                    (nested_url, nested_media or media)
+                                    for nested_url, nested_media
+                                    in nested_imports
+                                )
+                                if media:
+                                    tokens.append("@media {media} {{\n".format(
+                                        media = media,
+                                    ))
+                                tokens.extend(nested_tokens)
+                                if media:
+                                    tokens.append("\n}")
+                                continue
+                    imports.append((url, media))
+                    continue
+            tokens.append(token)
+        return tokens, imports
+
+    @cached_property
+    def _tokens_and_imported_assets(self):
+        """
+        Returns the tokens of each asset in this group, and a list of all inlined assets.
+
+        @import rules that were not inlined are hoisted to the start of the
+        first asset.
+        """
+        asset_tokens = []
+        imported_assets = []
+        hoisted_imports = []
         for asset in self._assets:
             # Load the asset source.
             with closing(asset.open()) as handle:
                 source = handle.read().decode("utf-8")
             # Get the asset URL.
             host_url = asset.get_url()
-            for re_url in RE_URLS:
-                def do_url_replacement(match):
-                    url = match.group(1).strip()
-                    # Resolve relative URLs.
-                    url = urlparse.urljoin(host_url, url)
-                    # Strip off query and fragment.
-                    url_parts = urlparse.urlparse(url)
-                    # Compile static urls.
-                    if url.startswith(settings.STATIC_URL):
-                        simple_url = urlparse.urlunparse(url_parts[:3] + ("", "", "",))
-                        static_url = default_asset_cache.get_url(simple_url[len(settings.STATIC_URL):], force_save=True)
-                        url = urlparse.urlunparse(urlparse.urlparse(static_url)[:3] + url_parts[3:])
-                    return "url({url})".format(
-                        url = url,
-                    )
-                source = re_url.sub(do_url_replacement, source)
-            file_parts.append(source.encode("utf-8"))
+            tokens, imports = self._tokenize(host_url, source, imported_assets, (self._get_static_name(host_url),))
+            asset_tokens.append(tokens)
+            for url_and_media in imports:
+                if url_and_media not in hoisted_imports:
+                    hoisted_imports.append(url_and_media)
+        if hoisted_imports:
+            import_tokens = []
+            for url, media in hoisted_imports:
+                import_tokens.append((True, url))
+                import_tokens.append("{media};\n".format(
+                    media = media and " " + media,
+                ))
+            asset_tokens[0] = import_tokens + asset_tokens[0]
+        return asset_tokens, imported_assets
+
+    @cached_property
+    def _data_uri_assets(self):
+        """
+        Returns a dict of url to (asset, data_uri) for all url references
+        small enough to be inlined as data URIs.
+        """
+        data_uri_assets = {}
+        if self._inline_max_size:
+            asset_tokens, _ = self._tokens_and_imported_assets
+            seen_urls = set()
+            for tokens in asset_tokens:
+                for token in tokens:
+                    if isinstance(token, tuple):
+                        is_import, url = token
+                        if is_import or url in seen_urls:
+                            continue
+                        seen_urls.add(url)
+                        static_name = self._get_static_name(url)
+                        if static_name is None:
+                            continue
+                        # Query strings and fragments are often significant, so leave them alone.
+                        url_parts = urlparse(url)
+                        if url_parts.query or url_parts.fragment:
+                            continue
+                        mimetype = DATA_URI_MIMETYPES.get(os.path.splitext(static_name)[1].lower())
+                        if mimetype is None:
+                            continue
+                        # Load small assets.
+                        try:
+                            if staticfiles_storage.size(static_name) > self._inline_max_size:
+                                continue
+                            asset = StaticAsset(static_name)
+                            contents = asset.get_contents()
+                        except (IOError, OSError):
+                            continue
+                        data_uri_assets[url] = (asset, make_data_uri(mimetype, contents))
+        return data_uri_assets
+
+    def _get_uncompiled_contents(self):
+        """Returns the contents of this asset, with all url references rewritten."""
+        # Tokenize the assets, resolving relative URLs.
+        asset_tokens, _ = self._tokens_and_imported_assets
+        data_uri_assets = self._data_uri_assets
+        static_names = set()
+        for tokens in asset_tokens:
+            for token in tokens:
+                if isinstance(token, tuple):
+                    is_import, url = token
+                    static_name = self._get_static_name(url)
+                    if static_name is None or (not is_import and url in data_uri_assets):
+                        continue
+                    # Leave missing imports for the browser to deal with.
+                    if is_import and not staticfiles_storage.exists(static_name):
+                        continue
+                    static_names.add(static_name)
+        # Resolve all the referenced static assets in a single batch.
+        static_names = sorted(static_names)
+        static_urls = dict(zip(static_names, default_asset_cache.get_urls(static_names, force_save=True)))
+        # Rewrite the url references, compiling static urls.
+        url_replacements = {}
+        file_parts = []
+        for tokens in asset_tokens:
+            tokens = list(tokens)
+            for n, token in enumerate(tokens):
+                if isinstance(token, tuple):
+                    replacement = url_replacements.get(token)
+                    if replacement is None:
+                        is_import, url = token
+                        static_name = self._get_static_name(url)
+                        if not is_import and url in data_uri_assets:
+                            # Inline small assets.
+                            url = data_uri_assets[url][1]
+                        elif static_name in static_urls:
+                            # Keep the original query and fragment.
+                            url = urlunparse(urlparse(static_urls[static_name])[:3] + urlparse(url)[3:])
+                        replacement = url_replacements[token] = format_url(is_import, url)
+                    tokens[n] = replacement
+            file_parts.append("".join(tokens).encode("utf-8"))
         # Consolidate the content.
-        contents = force_bytes(self.join_str).join(file_parts)
+        return force_bytes(self.join_str).join(file_parts)
+
+    def save(self, storage, name, meta):
+        """Saves this asset to the given storage."""
+        contents = self._get_uncompiled_contents()
         if self._compile:
             # Compress the content.
-            compressor_path = os.path.join(os.path.abspath(os.path.dirname(optimizations.__file__)), "resources", "yuicompressor.jar")
-            process = subprocess.Popen(
-                ("java", "-jar", compressor_path, "--type", "css", "--charset", "utf-8", "-v"),
-                stdin = subprocess.PIPE,
-                stdout = subprocess.PIPE,
-                stderr = subprocess.PIPE,
-            )
-            contents, stderrdata = process.communicate(contents)
-            # Check it all worked.
-            if process.returncode != 0:
-                raise StylesheetError("Error while compiling stylesheets.", stderrdata)
+            try:
+                contents = get_minifier().minify(contents, CSS)
+            except MinifierError as ex:
+                raise StylesheetError("Error while compiling stylesheets.", ex.detail_message)
         # Write the output.
-        storage.save(name, ContentFile(contents))
+        save_file(storage, name, ContentFile(contents))
+
+    def asave(self, storage, name, meta):
+        """Returns an awaitable that saves this asset, running the compressor asynchronously."""
+        from optimizations._async import asave_stylesheet
+        return asave_stylesheet(self, storage, name, meta)
 
 
 class StylesheetCache(object):
@@ -111,13 +369,19 @@ class StylesheetCache(object):
         """Initializes the thumbnail cache."""
         self._asset_cache = asset_cache
 
-    def get_urls(self, assets, compile=True, force_save=None):
-        """Returns a sequence of style URLs for the given assets."""
+    def get_urls(self, assets, compile=True, force_save=None, inline_imports=False, inline_max_size=0):
+        """
+        Returns a sequence of style URLs for the given assets.
+
+        If inline_imports is True, then local @import rules are inlined
+        into the compiled stylesheet. Referenced images and fonts no larger
+        than inline_max_size bytes are inlined as data URIs.
+        """
         if force_save is None:
             force_save = not settings.DEBUG
         if force_save:
             if assets:
-                return [self._asset_cache.get_url(StylesheetAsset(list(map(AdaptiveAsset, assets)), compile), force_save=True)]
+                return [self._asset_cache.get_url(StylesheetAsset(list(map(AdaptiveAsset, assets)), compile, inline_imports, inline_max_size), force_save=True)]
             return []
         return [self._asset_cache.get_url(asset) for asset in assets]
 
@@ -139,8 +403,39 @@ class StylesheetAssetCompilerPlugin(AssetCompilerPluginBase):
         self._stylesheet_cache = stylesheet_cache
 
     def compile_assets(self, assets):
-        """Compiles the given stylesheet assets."""
-        self._stylesheet_cache.get_urls(assets, force_save=True)
+        """Compiles the given stylesheet assets, returning a list of the compiled URLs."""
+        return self._stylesheet_cache.get_urls(assets, force_save=True)
+
+    def get_asset_cache(self):
+        """Returns the asset cache that the compiled assets are saved to."""
+        return self._stylesheet_cache._asset_cache
+
+    def get_build_params(self, assets):
+        """
+        Returns the params that affect the compiled output of the given assets.
+
+        Compiled stylesheets contain the asset cache names of the files they
+        reference, so the contents of referenced static files are included.
+        """
+        params = super(StylesheetAssetCompilerPlugin, self).get_build_params(assets)
+        params.update(get_minifier().get_id_params())
+        if assets:
+            stylesheet_asset = StylesheetAsset(list(map(AdaptiveAsset, assets)), True)
+            asset_tokens, _ = stylesheet_asset._tokens_and_imported_assets
+            static_names = set()
+            for tokens in asset_tokens:
+                for token in tokens:
+                    if isinstance(token, tuple):
+                        static_name = stylesheet_asset._get_static_name(token[1])
+                        if static_name is not None:
+                            static_names.add(static_name)
+            for static_name in static_names:
+                try:
+                    md5 = StaticAsset(static_name).get_contents_hash()
+                except (IOError, OSError):
+                    md5 = ""  # Missing files are left for the browser to deal with.
+                params["reference_{name}".format(name=static_name)] = md5
+        return params
 
 
 default_asset_compiler.register_plugin("css", StylesheetAssetCompilerPlugin())
@@ -1,15 +1,22 @@
 """Template tags used by django-optimizations."""
 
 
-def simple_tag(register, takes_context=False, name=None):
-    """Annotation for a Django 1.4 style simple tag."""
+def simple_tag(register, takes_context=False, name=None, cache_literals=False, on_cached_result=None):
+    """
+    Annotation for a Django 1.4 style simple tag.
+
+    If cache_literals is True, then the result of each tag with all-constant
+    arguments is calculated once, and reused for every render of that tag.
+    If given, on_cached_result is called with the cached result and the tag
+    arguments whenever it is reused.
+    """
     def decorator(func):
         # Use the django-supplied tag, if available.
-        if hasattr(register, "assignment_tag"):
+        if hasattr(register, "assignment_tag") and not cache_literals:
             return register.simple_tag(takes_context=takes_context, name=name)(func)
         # Otherwise, use the compatibility function.
         from optimizations.templatetags._compatibility import simple_tag_compat
-        return simple_tag_compat(register, takes_context, func, name)
+        return simple_tag_compat(register, takes_context, func, name, cache_literals, on_cached_result)
     return decorator
 
 
@@ -25,13 +32,36 @@ def inclusion_tag(register, file_name, takes_context=False, name=None):
     return decorator
 
 
-def assignment_tag(register, takes_context=False, name=None):
-    """Annotation for a Django-1.4 style assignment tag."""
+def fast_inclusion_tag(register, file_name, renderer, takes_context=False, name=None):
+    """
+    Annotation for an inclusion tag that can be rendered without the template engine.
+
+    If the OPTIMIZATIONS_FAST_TEMPLATE_TAGS setting is True, then the renderer
+    is called with the template params and the autoescape setting of the
+    context, and should return the same HTML as the template. Otherwise, the template is rendered as normal, so it can
+    be overridden.
+    """
+    def decorator(func):
+        # The compatibility tag passes through arbitrary arguments, unlike the django-supplied tag.
+        from optimizations.templatetags._compatibility import fast_inclusion_tag_compat
+        return fast_inclusion_tag_compat(register, file_name, renderer, takes_context, func, name or func.__name__)
+    return decorator
+
+
+def assignment_tag(register, takes_context=False, name=None, cache_literals=False, on_cached_result=None):
+    """
+    Annotation for a Django-1.4 style assignment tag.
+
+    If cache_literals is True, then the result of each tag with all-constant
+    arguments is calculated once, and reused for every render of that tag.
+    If given, on_cached_result is called with the cached result and the tag
+    arguments whenever it is reused.
+    """
     def decorator(func):
         # Use the django-supplied tag, if available.
-        if hasattr(register, "assignment_tag"):
+        if hasattr(register, "assignment_tag") and not cache_literals:
             return register.assignment_tag(takes_context=takes_context, name=name)(func)
         # Otherwise, use the compatibility function.
         from optimizations.templatetags._compatibility import assignment_tag_compat
-        return assignment_tag_compat(register, takes_context, func, name)
+        return assignment_tag_compat(register, takes_context, func, name, cache_literals, on_cached_result)
     return decorator
\ No newline at end of file
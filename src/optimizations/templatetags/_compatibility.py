@@ -5,6 +5,7 @@ import re
 from functools import wraps
 
 from django import template
+from django.conf import settings
 from django.utils.encoding import force_text
 from django.utils import six
 
@@ -12,8 +13,22 @@ from django.utils import six
 RE_KWARG = re.compile("([a-z][a-z0-9_]*)=(.*)", re.IGNORECASE)
 
 
+def is_literal(filter_expression):
+    """Tests whether the given filter expression is a constant, with no filters."""
+    if filter_expression.filters:
+        return False
+    var = filter_expression.var
+    if isinstance(var, template.Variable):
+        return var.lookups is None
+    return True
+
+
 def parse_token(parser, token):
-    """Parses the given token into a tuple of (args, kwargs and alias)."""
+    """
+    Parses the given token into a tuple of (args, kwargs, alias, literal).
+
+    Literal is True if all the arguments are constants.
+    """
     parts = token.split_contents()[1:]
     args = []
     kwargs = {}
@@ -33,36 +48,66 @@ def parse_token(parser, token):
             if kwargs:
                 raise template.TemplateSyntaxError("Positional arguments cannot follow keyword arguments")
             args.append(parser.compile_filter(part))
+    # Check for constant arguments.
+    literal = all(is_literal(arg) for arg in args) and all(is_literal(kwarg) for kwarg in kwargs.values())
     # All done!
-    return args, kwargs, alias
+    return args, kwargs, alias, literal
 
 
 class CompatibilityNode(template.Node):
 
     """A node for the compatibility tags."""
     
-    def __init__(self, takes_context, func, args, kwargs, alias):
-        """Initializes the parameter node."""
+    def __init__(self, takes_context, func, args, kwargs, alias, cache_result=False, on_cached_result=None):
+        """
+        Initializes the parameter node.
+
+        If cache_result is True, then the result of the tag is calculated on
+        the first render, and reused for subsequent renders. If given,
+        on_cached_result is called with the cached result and the tag
+        arguments whenever the cached result is reused.
+        """
         self._takes_context = takes_context
         self._func = func
         self._args = args
-        self._kwargs = kwargs
+        self._kwargs = list(six.iteritems(kwargs))
         self._alias = alias
-        
-    def render(self, context):
-        """Renders the parameter node."""
-        # Resolve all variables.
+        self._cache_result = cache_result
+        self._on_cached_result = on_cached_result
+        self._result = None
+
+    def _resolve_args(self, context):
+        """Resolves the tag arguments, returning a tuple of (args, kwargs)."""
         args = [arg.resolve(context) for arg in self._args]
         kwargs = dict(
             (name, value.resolve(context))
             for name, value
-            in six.iteritems(self._kwargs)
+            in self._kwargs
         )
+        return args, kwargs
+
+    def _get_result(self, context):
+        """Runs the tag function."""
+        args, kwargs = self._resolve_args(context)
         # Add in the context.
         if self._takes_context:
             args.insert(0, context)
         # Run the tag.
-        result = self._func(*args, **kwargs)
+        return self._func(*args, **kwargs)
+
+    def render(self, context):
+        """Renders the parameter node."""
+        if self._cache_result:
+            if self._result is None:
+                self._result = self._get_result(context)
+                if not self._alias:
+                    self._result = force_text(self._result)
+            elif self._on_cached_result is not None:
+                args, kwargs = self._resolve_args(context)
+                self._on_cached_result(self._result, *args, **kwargs)
+            result = self._result
+        else:
+            result = self._get_result(context)
         # Alias if required.
         if self._alias:
             context[self._alias] = result
@@ -71,15 +116,67 @@ class CompatibilityNode(template.Node):
         return force_text(result)
     
 
-def simple_tag_compat(register, takes_context, func, name):
-    """Compatibility shim for the Django 1.4 simple tab."""
+class InclusionNode(CompatibilityNode):
+
+    """
+    A node that renders the result of a tag using a template, or a fast
+    renderer if the OPTIMIZATIONS_FAST_TEMPLATE_TAGS setting is True.
+    """
+
+    def __init__(self, file_name, renderer, takes_context, func, args, kwargs):
+        """Initializes the inclusion node."""
+        super(InclusionNode, self).__init__(takes_context, func, args, kwargs, None)
+        self._file_name = file_name
+        self._renderer = renderer
+        self._template = None
+
+    def _get_template(self, context):
+        """Returns the template, which is loaded on the first render, and reused for subsequent renders."""
+        if self._template is None:
+            engine = getattr(getattr(context, "template", None), "engine", None)
+            if engine is None:
+                self._template = template.loader.get_template(self._file_name)
+            else:
+                self._template = engine.get_template(self._file_name)  # Django 1.8+.
+        return self._template
+
+    def render(self, context):
+        """Renders the inclusion node."""
+        params = self._get_result(context)
+        if getattr(settings, "OPTIMIZATIONS_FAST_TEMPLATE_TAGS", False):
+            return self._renderer(params, context.autoescape)
+        # Render the template in a new context, with the same settings as the parent context.
+        if hasattr(context, "new"):
+            new_context = context.new(params)
+        else:
+            new_context = template.Context(
+                params,
+                autoescape = context.autoescape,
+                current_app = context.current_app,
+                use_l10n = context.use_l10n,
+                use_tz = context.use_tz,
+            )
+        csrf_token = context.get("csrf_token", None)
+        if csrf_token is not None:
+            new_context["csrf_token"] = csrf_token
+        return self._get_template(context).render(new_context)
+
+
+def simple_tag_compat(register, takes_context, func, name, cache_literals=False, on_cached_result=None):
+    """
+    Compatibility shim for the Django 1.4 simple tab.
+
+    If cache_literals is True, then the results of tags with all-constant
+    arguments are cached on the node, and on_cached_result is called when
+    they are reused.
+    """
     @register.tag(name=name)
     @wraps(func)
     def compiler(parser, token):
-        args, kwargs, alias = parse_token(parser, token)
+        args, kwargs, alias, literal = parse_token(parser, token)
         if alias:
             raise template.TemplateSyntaxError("Alias not allowed for simple_tag")
-        return CompatibilityNode(takes_context, func, args, kwargs, alias)
+        return CompatibilityNode(takes_context, func, args, kwargs, alias, cache_literals and literal and not takes_context, on_cached_result)
     return func
 
 
@@ -97,13 +194,34 @@ def inclusion_tag_compat(register, file_name, takes_context, func, name):
     return simple_tag_compat(register, True, do_inclusion_tag_compat, name)
 
 
-def assignment_tag_compat(register, takes_context, func, name):
-    """Compatibility shim for the Django 1.4 simple tab."""
+def assignment_tag_compat(register, takes_context, func, name, cache_literals=False, on_cached_result=None):
+    """
+    Compatibility shim for the Django 1.4 simple tab.
+
+    If cache_literals is True, then the results of tags with all-constant
+    arguments are cached on the node, and on_cached_result is called when
+    they are reused.
+    """
     @register.tag(name=name)
     @wraps(func)
     def compiler(parser, token):
-        args, kwargs, alias = parse_token(parser, token)
+        args, kwargs, alias, literal = parse_token(parser, token)
         if not alias:
             raise template.TemplateSyntaxError("Alias not provided for assignment_tag")
-        return CompatibilityNode(takes_context, func, args, kwargs, alias)
-    return func
\ No newline at end of file
+        return CompatibilityNode(takes_context, func, args, kwargs, alias, cache_literals and literal and not takes_context, on_cached_result)
+    return func
+
+
+def fast_inclusion_tag_compat(register, file_name, renderer, takes_context, func, name):
+    """
+    Registers an inclusion tag that can be rendered by the given renderer,
+    instead of the template.
+    """
+    @register.tag(name=name)
+    @wraps(func)
+    def compiler(parser, token):
+        args, kwargs, alias, _ = parse_token(parser, token)
+        if alias:
+            raise template.TemplateSyntaxError("Alias not allowed for inclusion_tag")
+        return InclusionNode(file_name, renderer, takes_context, func, args, kwargs)
+    return func
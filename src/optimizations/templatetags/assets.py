@@ -2,7 +2,8 @@
 from __future__ import unicode_literals
 
 from django import template
-from django.utils.html import escape
+from django.utils.encoding import force_text
+from django.utils.html import escape, conditional_escape
 from django.utils import six
 
 try:
@@ -11,31 +12,95 @@ except ImportError:
     from six.moves.urllib.parse import urlparse
 
 from optimizations.assetcache import StaticAsset, default_asset_cache, AdaptiveAsset
+from optimizations.assetmanifest import default_asset_manifest
 from optimizations.thumbnailcache import default_thumbnail_cache, PROPORTIONAL, ThumbnailError
 from optimizations.javascriptcache import default_javascript_cache
 from optimizations.stylesheetcache import default_stylesheet_cache
-from optimizations.templatetags import simple_tag, inclusion_tag, assignment_tag
+from optimizations.templatetags import simple_tag, inclusion_tag, fast_inclusion_tag, assignment_tag
 from optimizations.videocache import default_video_cache, PROPORTIONAL as VIDEO_PROPORTIONAL, JPEG_FORMAT, VideoError
 
 
 register = template.Library()
 
 
-@simple_tag(register)
+# Fast renderers. These must output the same HTML as the corresponding templates.
+
+def _escape(value, autoescape):
+    """Escapes the given value, if autoescaping is on."""
+    if autoescape:
+        return conditional_escape(value)
+    return force_text(value)
+
+
+def _render_attrs(attrs, autoescape):
+    """Renders a dict of HTML attributes."""
+    return "".join(
+        ' {name}="{value}"'.format(
+            name = _escape(name, autoescape),
+            value = _escape(value, autoescape),
+        )
+        for name, value
+        in six.iteritems(attrs)
+    )
+
+
+def _render_img(params, autoescape):
+    """Renders assets/img.html."""
+    return '<img src="{url}" width={width} height={height} alt="{alt}"{attrs}>'.format(
+        url = _escape(params["url"], autoescape),
+        width = _escape(params["width"], autoescape),
+        height = _escape(params["height"], autoescape),
+        alt = _escape(params["alt"], autoescape),
+        attrs = _render_attrs(params["attrs"], autoescape),
+    )
+
+
+def _render_script(params, autoescape):
+    """Renders assets/script.html."""
+    attrs = _render_attrs(params["attrs"], autoescape)
+    return "".join(
+        '<script src="{url}"{attrs}></script>'.format(
+            url = _escape(url, autoescape),
+            attrs = attrs,
+        )
+        for url
+        in params["urls"]
+    )
+
+
+def _render_stylesheet(params, autoescape):
+    """Renders assets/stylesheet.html."""
+    attrs = _render_attrs(params["attrs"], autoescape)
+    return "".join(
+        '<link rel="stylesheet" href="{url}"{attrs}>'.format(
+            url = _escape(url, autoescape),
+            attrs = attrs,
+        )
+        for url
+        in params["urls"]
+    )
+
+
+def _log_cached_url(url, src):
+    """Records that a cached asset URL is still in use, so it isn't cleaned."""
+    default_asset_cache._log_url_access(url, src)
+
+
+@simple_tag(register, cache_literals=True, on_cached_result=_log_cached_url)
 def asset(src):
     """Returns the cached asset URL of the given asset."""
     url = default_asset_cache.get_url(src)
     return escape(url)
 
 
-@assignment_tag(register)
+@assignment_tag(register, cache_literals=True, on_cached_result=_log_cached_url)
 def get_asset(src):
     return default_asset_cache.get_url(src)
 
 
-@inclusion_tag(register, "assets/img.html")
+@fast_inclusion_tag(register, "assets/img.html", _render_img)
 @assignment_tag(register, name="get_img")
-def img(src, width=None, height=None, method=PROPORTIONAL, alt="", **attrs):
+def img(src, width=None, height=None, method=PROPORTIONAL, alt="", focal_point=None, **attrs):
     """Renders an image tag."""
     params = {
         "alt": alt,
@@ -47,6 +112,7 @@ def img(src, width=None, height=None, method=PROPORTIONAL, alt="", **attrs):
             width = width,
             height = height,
             method = method,
+            focal_point = focal_point,
         )
     except ThumbnailError:
         asset = AdaptiveAsset(src)
@@ -65,7 +131,7 @@ def img(src, width=None, height=None, method=PROPORTIONAL, alt="", **attrs):
     return params
 
 
-@inclusion_tag(register, "assets/img.html")
+@fast_inclusion_tag(register, "assets/img.html", _render_img)
 @assignment_tag(register, name="get_video_img")
 def video_img(src, width, height, method=VIDEO_PROPORTIONAL, alt="", **attrs):
     """Renders an image tag from the given video."""
@@ -101,11 +167,15 @@ def resolve_script_src(src, _src):
             return all_src  # All are URLs, which is allowed.
         else:
             raise ValueError("Mixed assets and absolute URLs are not allowed in script tags.")
+    # Use the precompiled manifest, if available.
+    urls = default_asset_manifest.get_urls("js", all_src)
+    if urls is not None:
+        return urls
     assets = StaticAsset.load("js", all_src)
     return default_javascript_cache.get_urls(assets)
 
 
-@inclusion_tag(register, "assets/script.html")
+@fast_inclusion_tag(register, "assets/script.html", _render_script)
 def script(src="default", *_src, **attrs):
     """Renders one or more script tags."""
     urls = resolve_script_src(src, _src)
@@ -124,10 +194,12 @@ def script_async(src="default", *_src):
     }
 
 
-@inclusion_tag(register, "assets/stylesheet.html")
+@fast_inclusion_tag(register, "assets/stylesheet.html", _render_stylesheet)
 def stylesheet(href="default", *_href, **attrs):
     """Renders one or more stylesheet tags."""
     compile = attrs.pop("compile", True)
+    inline_imports = attrs.pop("inline_imports", False)
+    inline_max_size = attrs.pop("inline_max_size", 0)
     all_href = (href,) + _href
     href_urls = list(filter(is_url, all_href))
     if href_urls:
@@ -136,8 +208,13 @@ def stylesheet(href="default", *_href, **attrs):
         else:
             raise ValueError("Mixed assets and absolute URLs are not allowed in stylesheet tags.")
     else:
-        assets = StaticAsset.load("css", all_href)
-        urls = default_stylesheet_cache.get_urls(assets, compile=compile)
+        # Use the precompiled manifest, if available. It is only compiled with the default options.
+        urls = None
+        if compile is True and not inline_imports and not inline_max_size:
+            urls = default_asset_manifest.get_urls("css", all_href)
+        if urls is None:
+            assets = StaticAsset.load("css", all_href)
+            urls = default_stylesheet_cache.get_urls(assets, compile=compile, inline_imports=inline_imports, inline_max_size=inline_max_size)
     return {
         "urls": urls,
         "attrs": attrs,
@@ -2,20 +2,26 @@
 from __future__ import unicode_literals
 
 import collections
+import math
 import sys
 import os.path
+import tempfile
+from contextlib import closing
 
 try:
     from io import BytesIO as StringIO
 except Exception as e:
     from cStringIO import StringIO
 
-from PIL import Image
+from PIL import Image, ImageFilter, ImageStat
 
+from django.conf import settings
 from django.core.files.base import File
+from django.utils import six
 
-from optimizations.assetcache import default_asset_cache, Asset, AdaptiveAsset
+from optimizations.assetcache import default_asset_cache, Asset, AdaptiveAsset, register_recipe_loader, load_recipe
 from optimizations.propertycache import cached_property
+from optimizations.utils import get_storage_path, atomic_write
 
 
 class Size(collections.namedtuple("SizeBase", ("width", "height",))):
@@ -83,36 +89,112 @@ def _size_proportional(reference, size):
 
 # Resize callbacks. These are used to actually resize the image data.
 
-def _resize(image, image_size, thumbnail_display_size, thumbnail_image_size):
+def _resize(image, image_size, thumbnail_display_size, thumbnail_image_size, focal_point=None):
     """
     Resizes the image to exactly match the desired data size, ignoring aspect
     ratio.
     """
     return image.resize(thumbnail_image_size, Image.ANTIALIAS)
 
-def _resize_cropped(image, image_size, thumbnail_display_size, thumbnail_image_size):
+# Focal point callbacks. These are used to determine the center of a cropped thumbnail.
+
+def _focal_point_center(image, crop_size):
+    """Crops around the center of the image."""
+    return (0.5, 0.5)
+
+
+# Smart crops are calculated on a copy of the image reduced to fit inside this size.
+SMART_CROP_SIZE = 64
+
+
+def _entropy(image):
+    """Returns the entropy of the given greyscale image."""
+    histogram = image.histogram()
+    total = float(sum(histogram))
+    return -sum(
+        count / total * math.log(count / total, 2)
+        for count in histogram
+        if count
+    )
+
+
+def _mean(image):
+    """Returns the mean brightness of the given greyscale image."""
+    return ImageStat.Stat(image).mean[0]
+
+
+def _focal_point_smart(prepare, score):
     """
-    Resizes the image to fit the desired size, preserving aspect ratio by
-    cropping, if required.
+    Returns a focal point callback that crops around the most interesting
+    part of the image.
+
+    A reduced, greyscale copy of the image is passed through prepare, then
+    each possible crop of it is passed to score. The crop with the highest
+    score wins, with ties going to the crop closest to the center.
     """
-    # Resize with nice filter.
-    image_aspect = image_size.aspect
-    if image_aspect > thumbnail_image_size.aspect:
-        # Too wide.
-        pre_cropped_size = Size(thumbnail_image_size.height * image_aspect, thumbnail_image_size.height)
-    else:
-        # Too tall.
-        pre_cropped_size = Size(thumbnail_image_size.width, thumbnail_image_size.width / image_aspect)
-    # Crop.
-    image = image.resize(pre_cropped_size, Image.ANTIALIAS)
-    source_x = int((pre_cropped_size.width - thumbnail_image_size.width) / 2)
-    source_y = int((pre_cropped_size.height - thumbnail_image_size.height) / 2)
-    return image.crop((
+    def get_focal_point(image, crop_size):
+        scale = min(1.0, float(SMART_CROP_SIZE) / max(image.size))
+        small_size = Size(max(image.size[0] * scale, 1), max(image.size[1] * scale, 1))
+        small_image = prepare(image.resize(small_size, Image.NEAREST).convert("L"))
+        window_size = crop_size.scale(scale, scale)
+        window_size = Size(
+            min(max(window_size.width, 1), small_size.width),
+            min(max(window_size.height, 1), small_size.height),
+        )
+        center_x = (small_size.width - window_size.width) / 2.0
+        center_y = (small_size.height - window_size.height) / 2.0
+        _, x, y = max(
+            ((score(small_image.crop((x, y, x + window_size.width, y + window_size.height))), -abs(x - center_x) - abs(y - center_y)), x, y)
+            for x in range(small_size.width - window_size.width + 1)
+            for y in range(small_size.height - window_size.height + 1)
+        )
+        return (
+            (x + window_size.width / 2.0) / small_size.width,
+            (y + window_size.height / 2.0) / small_size.height,
+        )
+    return get_focal_point
+
+
+def _get_crop_box(image_size, crop_size, focal_point):
+    """
+    Returns the box of the given crop size within the image, centered as
+    closely as possible on the focal point.
+    """
+    source_x = int(focal_point[0] * image_size.width - crop_size.width / 2.0)
+    source_y = int(focal_point[1] * image_size.height - crop_size.height / 2.0)
+    source_x = max(0, min(source_x, image_size.width - crop_size.width))
+    source_y = max(0, min(source_y, image_size.height - crop_size.height))
+    return (
         source_x,
         source_y,
-        source_x + thumbnail_image_size.width,
-        source_y + thumbnail_image_size.height,
-    ))
+        source_x + crop_size.width,
+        source_y + crop_size.height,
+    )
+
+
+def _resize_cropped(get_focal_point):
+    """
+    Returns a resize callback that resizes the image to fit the desired
+    size, preserving aspect ratio by cropping, if required.
+
+    The crop is centered on the focal point, if given, or the focal point
+    returned by get_focal_point.
+    """
+    def do_resize(image, image_size, thumbnail_display_size, thumbnail_image_size, focal_point=None):
+        # Resize with nice filter.
+        image_aspect = image_size.aspect
+        if image_aspect > thumbnail_image_size.aspect:
+            # Too wide.
+            pre_cropped_size = Size(thumbnail_image_size.height * image_aspect, thumbnail_image_size.height)
+        else:
+            # Too tall.
+            pre_cropped_size = Size(thumbnail_image_size.width, thumbnail_image_size.width / image_aspect)
+        # Crop.
+        image = image.resize(pre_cropped_size, Image.ANTIALIAS)
+        if focal_point is None:
+            focal_point = get_focal_point(image, thumbnail_image_size)
+        return image.crop(_get_crop_box(pre_cropped_size, thumbnail_image_size, focal_point))
+    return do_resize
 
 
 # Methods of generating thumbnails.
@@ -120,13 +202,17 @@ def _resize_cropped(image, image_size, thumbnail_display_size, thumbnail_image_s
 PROPORTIONAL = "proportional"
 RESIZE = "resize"
 CROP = "crop"
+CROP_ENTROPY = "crop_entropy"
+CROP_EDGES = "crop_edges"
 
 ResizeMethod = collections.namedtuple("ResizeMethod", ("get_display_size", "get_data_size", "do_resize", "hash_key",))
 
 _methods = {
     PROPORTIONAL: ResizeMethod(_size_proportional, _size, _resize, "resize"),
     RESIZE: ResizeMethod(_size, _size, _resize, "resize"),
-    CROP: ResizeMethod(_size, _size_proportional, _resize_cropped, "crop"),
+    CROP: ResizeMethod(_size, _size_proportional, _resize_cropped(_focal_point_center), "crop"),
+    CROP_ENTROPY: ResizeMethod(_size, _size_proportional, _resize_cropped(_focal_point_smart(lambda image: image, _entropy)), "crop_entropy"),
+    CROP_EDGES: ResizeMethod(_size, _size_proportional, _resize_cropped(_focal_point_smart(lambda image: image.filter(ImageFilter.FIND_EDGES), _mean)), "crop_edges"),
 }
 
 
@@ -135,16 +221,40 @@ class ThumbnailError(Exception):
     """Something went wrong with thumbnail generation."""
 
 
+# Remote images larger than this are spooled to disk while being thumbnailed.
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+# Image modes that can be reduced by averaging pixels. Palette, bilevel and
+# 16-bit images are left to the final resize.
+REDUCE_MODES = frozenset(("L", "LA", "La", "I", "F", "RGB", "RGBA", "RGBa", "RGBX", "CMYK", "YCbCr", "LAB", "HSV"))
+
+
+def _reduce(image, size):
+    """
+    Cheaply reduces the image by an integer factor, keeping it at least
+    twice the given size, so the final resize has less work to do.
+    Requires Pillow 7+.
+    """
+    if image.mode not in REDUCE_MODES or not hasattr(image, "reduce"):
+        return image
+    factor = min(image.size[0] // (size.width * 2), image.size[1] // (size.height * 2))
+    if factor > 1:
+        return image.reduce(factor)
+    return image
+
+
 class ThumbnailAsset(Asset):
 
     """An asset representing a thumbnailed file."""
 
-    def __init__(self, asset, width, height, method):
+    def __init__(self, asset, width, height, method, focal_point=None):
         """Initializes the asset."""
         self._asset = asset
         self._width = width
         self._height = height
         self._method = method
+        self._focal_point = focal_point
 
     def open(self):
         """Returns an open File for this asset."""
@@ -168,8 +278,21 @@ class ThumbnailAsset(Asset):
         params["width"] = self._width is None and -1 or self._width
         params["height"] = self._height is None and -1 or self._height
         params["method"] = self._method.hash_key
+        if self._focal_point is not None:
+            params["focal_point"] = "{0},{1}".format(*self._focal_point)
         return params
 
+    def get_recipe(self):
+        """Returns a recipe for recreating this asset."""
+        return {
+            "type": "thumbnail",
+            "asset": self._asset.get_recipe(),
+            "width": self._width,
+            "height": self._height,
+            "method": [name for name, method in six.iteritems(_methods) if method is self._method][0],
+            "focal_point": self._focal_point,
+        }
+
     @cached_property
     def _image_data_and_size(self):
         """Returns the image data used by this thumbnail asset."""
@@ -202,7 +325,8 @@ class ThumbnailAsset(Asset):
             image_data.draft(None, data_size)
             # Resize the image data.
             try:
-                image_data = method.do_resize(image_data, original_size, display_size, data_size)
+                image_data = _reduce(image_data, data_size)
+                image_data = method.do_resize(image_data, original_size, display_size, data_size, self._focal_point)
             except Exception as ex:  # HACK: PIL raises all sorts of Exceptions :(
                 raise ThumbnailError(str(ex))
             # Parse the image format.
@@ -212,9 +336,8 @@ class ThumbnailAsset(Asset):
             if image_data.mode == "CMYK" and format == "PNG":
                 image_data = image_data.convert("RGB")
             # If the storage has a path, then save it efficiently.
-            try:
-                thumbnail_path = storage.path(name)
-            except NotImplementedError:
+            thumbnail_path = get_storage_path(storage, name)
+            if thumbnail_path is None:
                 # No path for the storage, so save it in a memory buffer.
                 buffer = StringIO()
                 try:
@@ -229,47 +352,73 @@ class ThumbnailAsset(Asset):
                 file.size = buffer_length
                 storage.save(name, file)
             else:
-                # We can do an efficient streaming save.
-                try:
-                    os.makedirs(os.path.dirname(thumbnail_path))
-                except OSError:
-                    pass
-                try:
-                    image_data.save(thumbnail_path, format)
-                except Exception as ex:  # HACK: PIL raises all sorts of Exceptions :(
+                # We can do an efficient streaming save, atomically renamed into place.
+                with atomic_write(thumbnail_path) as temp_path:
                     try:
+                        image_data.save(temp_path, format)
+                    except Exception as ex:  # HACK: PIL raises all sorts of Exceptions :(
                         raise ThumbnailError(str(ex))
-                    finally:
-                        # Remove an incomplete file, if present.
-                        try:
-                            os.unlink(thumbnail_path)
-                        except:
-                            pass
 
 
 def open_image(asset):
-    """Opens the image represented by the given asset."""
+    """
+    Opens the image represented by the given asset.
+
+    Remote images are spooled to a temporary file, rather than read into
+    memory. If the image is larger than the OPTIMIZATIONS_THUMBNAIL_MAX_BYTES
+    or OPTIMIZATIONS_THUMBNAIL_MAX_PIXELS settings, a ThumbnailError is raised
+    before the image data is loaded.
+    """
+    max_bytes = getattr(settings, "OPTIMIZATIONS_THUMBNAIL_MAX_BYTES", None)
+    max_pixels = getattr(settings, "OPTIMIZATIONS_THUMBNAIL_MAX_PIXELS", None)
     try:
         asset_path = asset.get_path()
     except NotImplementedError:
-        return Image.open(StringIO(asset.get_contents()))
+        image_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        with closing(asset.open()) as handle:
+            for chunk in handle.chunks():
+                image_file.write(chunk)
+                if max_bytes is not None and image_file.tell() > max_bytes:
+                    image_file.close()
+                    raise ThumbnailError("Image {name} is larger than {max_bytes} bytes.".format(
+                        name = asset.get_name(),
+                        max_bytes = max_bytes,
+                    ))
+        image_file.seek(0)
+        image = Image.open(image_file)
     else:
-        return Image.open(asset_path)
+        if max_bytes is not None and os.path.getsize(asset_path) > max_bytes:
+            raise ThumbnailError("Image {name} is larger than {max_bytes} bytes.".format(
+                name = asset.get_name(),
+                max_bytes = max_bytes,
+            ))
+        image = Image.open(asset_path)
+    # Opening an image only reads its header, so check the size before it's loaded.
+    width, height = image.size
+    if max_pixels is not None and width * height > max_pixels:
+        raise ThumbnailError("Image {name} is larger than {max_pixels} pixels.".format(
+            name = asset.get_name(),
+            max_pixels = max_pixels,
+        ))
+    return image
 
 
 class Thumbnail(object):
 
     """A generated thumbnail."""
 
-    def __init__(self, asset_cache, asset):
+    def __init__(self, asset_cache, asset, name_and_meta=None):
         """Initializes the thumbnail."""
         self._asset_cache = asset_cache
         self._asset = asset
+        self._name_and_meta = name_and_meta
         self.name = asset.get_name()
 
-    @cached_property
+    @property
     def _asset_name_and_meta(self):
-        return self._asset_cache.get_name_and_meta(self._asset)
+        if self._name_and_meta is None:
+            self._name_and_meta = self._asset_cache.get_name_and_meta(self._asset)
+        return self._name_and_meta
 
     @property
     def width(self):
@@ -300,13 +449,8 @@ class ThumbnailCache(object):
         """Initializes the thumbnail cache."""
         self._asset_cache = asset_cache
 
-    def get_thumbnail(self, asset, width=None, height=None, method=PROPORTIONAL):
-        """
-        Returns a thumbnail of the given size.
-
-        Either or both of width and height may be None, in which case the
-        image's original size will be used.
-        """
+    def _get_thumbnail_asset(self, asset, width, height, method, focal_point):
+        """Returns the thumbnail asset for the given parameters."""
         # Lookup the method.
         try:
             method = _methods[method]
@@ -315,11 +459,56 @@ class ThumbnailCache(object):
                 method = method,
                 methods = ", ".join(_methods.keys())
             ))
+        # Parse the focal point.
+        if focal_point is not None:
+            if isinstance(focal_point, six.string_types):
+                focal_point = focal_point.split(",")
+            try:
+                focal_point = tuple(float(value) for value in focal_point)
+            except (TypeError, ValueError):
+                focal_point = ()
+            if len(focal_point) != 2 or not all(0.0 <= value <= 1.0 for value in focal_point):
+                raise ValueError("Focal point should be a pair of x and y values between 0 and 1.")
+            # Only cropping uses the focal point, so don't let it split the cache for other methods.
+            if method.do_resize is _resize:
+                focal_point = None
         # Adapt the asset.
         asset = AdaptiveAsset(asset)
-        # Create the thumbnail.
-        return Thumbnail(self._asset_cache, ThumbnailAsset(asset, width, height, method))
+        # Create the thumbnail asset.
+        return ThumbnailAsset(asset, width, height, method, focal_point)
+
+    def get_thumbnail(self, asset, width=None, height=None, method=PROPORTIONAL, focal_point=None):
+        """
+        Returns a thumbnail of the given size.
+
+        Either or both of width and height may be None, in which case the
+        image's original size will be used.
+
+        Cropped thumbnails are centered on the focal point, if given, as a pair
+        of x and y values between 0 and 1, or a string of "x,y". Other methods
+        ignore the focal point.
+        """
+        return Thumbnail(self._asset_cache, self._get_thumbnail_asset(asset, width, height, method, focal_point))
+
+    def aget_thumbnail(self, asset, width=None, height=None, method=PROPORTIONAL, focal_point=None):
+        """
+        Returns a thumbnail of the given size, without blocking the event loop.
+
+        The thumbnail is generated before it is returned, so its attributes can
+        be accessed without blocking. Requires Python 3.5+.
+        """
+        from optimizations._async import aget_thumbnail
+        return aget_thumbnail(self._asset_cache, self._get_thumbnail_asset(asset, width, height, method, focal_point))
 
 
 # The default thumbnail cache.
 default_thumbnail_cache = ThumbnailCache()
+
+
+register_recipe_loader("thumbnail", lambda recipe: default_thumbnail_cache._get_thumbnail_asset(
+    load_recipe(recipe["asset"]),
+    recipe["width"],
+    recipe["height"],
+    recipe["method"],
+    recipe["focal_point"],
+))
@@ -1,14 +1,157 @@
 """Random utility functions."""
 from __future__ import unicode_literals
 
+import errno, os, os.path, shutil, sys, tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
 from django.core.cache import get_cache, InvalidCacheBackendError, cache as default_cache
 
 
 def resolve_namespaced_cache(name):
     """Finds the best-matching named cache that exists."""
+    # Only look up configured caches, since get_cache treats other names as
+    # backend paths, and cache names often match module paths.
+    if name in getattr(settings, "CACHES", {}):
+        try:
+            return get_cache(name)
+        except (InvalidCacheBackendError, ValueError):
+            pass
+    if "." in name:
+        return resolve_namespaced_cache(name.rsplit(".", 1)[0])
+    return default_cache
+
+
+def get_storage_path(storage, name):
+    """Returns the local path of the named file in the storage, or None if the storage is remote."""
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def _makedirs(dirname):
+    """Creates the given directory, if it does not already exist."""
+    try:
+        os.makedirs(dirname)
+    except OSError:
+        pass
+
+
+# Atomic rename, overwriting any existing file. Python 3.3+ only.
+_replace = getattr(os, "replace", os.rename)
+
+
+@contextmanager
+def atomic_write(path):
+    """
+    Yields a temporary path to write the given file to.
+
+    The temporary file is in the same directory as the final path. On
+    success, it is renamed into place, so readers never see a partial file,
+    and concurrent writers can safely race. On failure, it is removed. If
+    the OPTIMIZATIONS_FSYNC setting is True, the file is flushed to disk
+    before being renamed.
+    """
+    dirname = os.path.dirname(path)
+    _makedirs(dirname)
+    handle, temp_path = tempfile.mkstemp(
+        dir = dirname,
+        prefix = ".tmp-",
+        suffix = os.path.splitext(path)[1],
+    )
+    os.close(handle)
     try:
-        return get_cache(name)
-    except (InvalidCacheBackendError, ValueError):
-        if "." in name:
-            return resolve_namespaced_cache(name.rsplit(".", 1)[0])
-        return default_cache
\ No newline at end of file
+        yield temp_path
+        if getattr(settings, "OPTIMIZATIONS_FSYNC", False):
+            with open(temp_path, "rb") as handle:
+                os.fsync(handle.fileno())
+        os.chmod(temp_path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        _replace(temp_path, path)
+    except:
+        # Remove an incomplete file, if present.
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_file(storage, name, content):
+    """
+    Saves the given File to the storage.
+
+    If the storage has local paths, then the file is written atomically.
+    """
+    path = get_storage_path(storage, name)
+    if path is None:
+        storage.save(name, content)
+        return
+    with atomic_write(path) as temp_path:
+        with open(temp_path, "wb") as handle:
+            for chunk in content.chunks():
+                handle.write(chunk)
+
+
+def _copy_file_range(src_fd, dst_fd, size):
+    """Copies a file in the kernel, using reflinks on filesystems that support them. Python 3.8+ only."""
+    copied = 0
+    while copied < size:
+        count = os.copy_file_range(src_fd, dst_fd, size - copied)
+        if count == 0:
+            break
+        copied += count
+
+
+def _sendfile(src_fd, dst_fd, size):
+    """Copies a file in the kernel. Python 3.3+ only."""
+    copied = 0
+    while copied < size:
+        count = os.sendfile(dst_fd, src_fd, copied, size - copied)
+        if count == 0:
+            break
+        copied += count
+
+
+# Zero-copy methods, in order of preference. Only Linux supports sendfile between regular files.
+_kernel_copies = []
+if hasattr(os, "copy_file_range"):
+    _kernel_copies.append(_copy_file_range)
+if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+    _kernel_copies.append(_sendfile)
+
+
+def copy_file(src_path, dst_path):
+    """
+    Copies the file at src_path to dst_path.
+
+    The file is copied in the kernel where supported, and written atomically.
+    If the OPTIMIZATIONS_HARDLINK_ASSETS setting is True, the file is
+    hardlinked instead, which is only safe if the source file is never
+    modified in place.
+    """
+    if getattr(settings, "OPTIMIZATIONS_HARDLINK_ASSETS", False):
+        _makedirs(os.path.dirname(dst_path))
+        try:
+            os.link(src_path, dst_path)
+        except OSError as ex:
+            # If the file exists, then it's been saved by a concurrent writer.
+            if ex.errno == errno.EEXIST:
+                return
+            # Cross-device or unsupported, so fall back to copying.
+        else:
+            return
+    with atomic_write(dst_path) as temp_path:
+        with open(src_path, "rb") as src_handle, open(temp_path, "wb") as dst_handle:
+            size = os.fstat(src_handle.fileno()).st_size
+            for kernel_copy in _kernel_copies:
+                try:
+                    kernel_copy(src_handle.fileno(), dst_handle.fileno(), size)
+                except OSError:
+                    # Not supported for these files, so reset and try the next method.
+                    src_handle.seek(0)
+                    dst_handle.seek(0)
+                    dst_handle.truncate()
+                else:
+                    return
+            shutil.copyfileobj(src_handle, dst_handle, 1024 * 1024)
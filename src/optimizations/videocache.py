@@ -2,11 +2,11 @@
 from __future__ import unicode_literals
 
 import collections
-import os
 import re
 import subprocess
 
-from optimizations.assetcache import Asset, default_asset_cache, AdaptiveAsset
+from optimizations.assetcache import Asset, default_asset_cache, AdaptiveAsset, register_recipe_loader, load_recipe
+from optimizations.utils import get_storage_path, atomic_write
 
 
 class VideoError(Exception):
@@ -59,43 +59,63 @@ _methods = {
 }
 
 
+# Video duration probing.
+
+def get_duration_command(input_path):
+    """Returns the command used to probe the duration of a video."""
+    return ("ffmpeg", "-i", input_path)
+
+
+def parse_duration(stdoutdata, stderrdata):
+    """Parses the duration of a video, in seconds, from the output of the probe command."""
+    duration_match = RE_DURATION.search(" ".join((
+        stdoutdata.decode("utf-8", "replace"),
+        stderrdata.decode("utf-8", "replace"),
+    )))
+    if duration_match:
+        hours, minutes, seconds = duration_match.groups()
+        return int(hours) * 60 * 60 + int(minutes) * 60 + int(seconds)
+    # Fallback - we can't parse the time, so assume 0 seconds.
+    return 0
+
+
+def get_duration(input_path):
+    """Returns the duration of the given video, in seconds."""
+    process = subprocess.Popen(
+        get_duration_command(input_path),
+        stdin = subprocess.PIPE,
+        stdout = subprocess.PIPE,
+        stderr = subprocess.PIPE,
+    )
+    stdoutdata, stderrdata = process.communicate()
+    return parse_duration(stdoutdata, stderrdata)
+
+
 # Video format callbacks.
 
-def _format_jpeg(input_path, offset):
+def _format_jpeg():
     """Formats video to a jpeg thumbnail."""
-    # Get the video duration.
-    if offset is None:
-        process = subprocess.Popen(
-            ("ffmpeg", "-i", input_path),
-            stdin = subprocess.PIPE,
-            stdout = subprocess.PIPE,
-            stderr = subprocess.PIPE,
-        )
-        stdoutdata, stderrdata = process.communicate()
-        duration_match = RE_DURATION.search(" ".join((stdoutdata, stderrdata,)))
-        if duration_match:
-            hours, minutes, seconds = duration_match.groups()
-            duration = int(hours) * 60 * 60 + int(minutes) * 60 * 60 + int(seconds)
-        else:
-            # Fallback - we can't parse the time, so assume 0 seconds.
-            duration = 0
-        offset = duration / 4
-    return offset, ("-vframes", "1", "-an", "-f", "image2",)
+    return ("-vframes", "1", "-an", "-f", "image2",)
+
 
+def _offset_jpeg(duration):
+    """Takes jpeg thumbnails a quarter of the way into the video."""
+    return duration / 4
 
-def _format_mp4(input_path, offset):
+
+def _format_mp4():
     """Formats the video to an MP4."""
-    return offset, ("-f", "mp4",)
+    return ("-f", "mp4",)
 
 
 JPEG_FORMAT = "jpeg"
 MP4_FORMAT = "mp4"
 
-FormatMethod = collections.namedtuple("FormatMethod", ("get_format_params", "extension", "hash_key",))
+FormatMethod = collections.namedtuple("FormatMethod", ("get_format_params", "get_default_offset", "extension", "hash_key",))
 
 _formats = {
-    JPEG_FORMAT: FormatMethod(_format_jpeg, "jpg", "jpeg"),
-    MP4_FORMAT: FormatMethod(_format_mp4, "mp4", "mp4"),
+    JPEG_FORMAT: FormatMethod(_format_jpeg, _offset_jpeg, "jpg", "jpeg"),
+    MP4_FORMAT: FormatMethod(_format_mp4, None, "mp4", "mp4"),
 }
 
 
@@ -133,50 +153,83 @@ class VideoAsset(Asset):
         params["offset"] = self._offset is None and -1 or self._offset
         return params
 
+    def get_recipe(self):
+        """Returns a recipe for recreating this asset."""
+        return {
+            "type": "video",
+            "asset": self._asset.get_recipe(),
+            "width": self._width,
+            "height": self._height,
+            "method": [name for name, method in _methods.items() if method is self._method][0],
+            "format": [name for name, format in _formats.items() if format is self._format][0],
+            "offset": self._offset,
+        }
+
     def get_save_extension(self):
         """Returns the file extension to use when saving the asset."""
         return "." + self._format.extension
 
-    def save(self, storage, name, meta):
-        """Saves the video."""
-        # Get the input handle.
+    def _get_input_path(self):
+        """Returns the path of the source video."""
         try:
-            input_path = self._asset.get_path()
+            return self._asset.get_path()
         except NotImplementedError:
-            raise VideoError("Video cache cannot operate on remote filesystems")
+            raise VideoError("Video cache cannot operate on remote filesystems", "")
+
+    def _get_output_path(self, storage, name):
+        """Returns the path of the processed video."""
+        output_path = get_storage_path(storage, name)
+        if output_path is None:
+            raise VideoError("Video cache cannot operate on remote filesystems", "")
+        return output_path
+
+    def _needs_duration(self):
+        """Returns whether the duration of the source video is needed to calculate the offset."""
+        return self._offset is None and self._format.get_default_offset is not None
+
+    def _get_command(self, input_path, output_path, duration):
+        """Returns the ffmpeg command used to process the video."""
         # Calculate sizes.
         if self._width is not None or self._height is not None:
             size_params = self._method.get_size_params(self._width or "iw", self._height or "ih")
         else:
             size_params = ()
         # Calculate offset and format.
-        offset, format_params = self._format.get_format_params(input_path, self._offset)
-        # Get the output path.
-        try:
-            output_path = storage.path(name)
-        except NotImplementedError:
-            raise VideoError("Video cache cannot operate on remote filesystems")
-        try:
-            os.makedirs(os.path.dirname(output_path))
-        except OSError:
-            pass
-        # Generate the video.
-        process = subprocess.Popen(
-            ("ffmpeg", "-ss", str(offset or 0), "-i", input_path,) + size_params + format_params + (output_path,),
-            stdin = subprocess.PIPE,
-            stdout = subprocess.PIPE,
-            stderr = subprocess.PIPE,
-        )
-        stdoutdata, stderrdata = process.communicate()
-        if process.returncode != 0:
-            try:
-                raise VideoError("Could not generate video due to video processing error", " ".join((stdoutdata, stderrdata,)))
-            finally:
-                # Remove an incomplete file, if present.
-                try:
-                    os.unlink(output_path)
-                except:
-                    pass
+        offset = self._offset
+        if offset is None and duration is not None:
+            offset = self._format.get_default_offset(duration)
+        format_params = self._format.get_format_params()
+        # The output is written to a temporary file, so overwrite it.
+        return ("ffmpeg", "-y", "-ss", str(offset or 0), "-i", input_path,) + size_params + format_params + (output_path,)
+
+    def _check_result(self, returncode, stdoutdata, stderrdata):
+        """Checks the result of the ffmpeg command."""
+        if returncode != 0:
+            raise VideoError("Could not generate video due to video processing error", " ".join((
+                stdoutdata.decode("utf-8", "replace"),
+                stderrdata.decode("utf-8", "replace"),
+            )))
+
+    def save(self, storage, name, meta):
+        """Saves the video."""
+        input_path = self._get_input_path()
+        output_path = self._get_output_path(storage, name)
+        duration = get_duration(input_path) if self._needs_duration() else None
+        # Generate the video, atomically renaming it into place.
+        with atomic_write(output_path) as temp_path:
+            process = subprocess.Popen(
+                self._get_command(input_path, temp_path, duration),
+                stdin = subprocess.PIPE,
+                stdout = subprocess.PIPE,
+                stderr = subprocess.PIPE,
+            )
+            stdoutdata, stderrdata = process.communicate()
+            self._check_result(process.returncode, stdoutdata, stderrdata)
+
+    def asave(self, storage, name, meta):
+        """Returns an awaitable that saves the video, running ffmpeg asynchronously."""
+        from optimizations._async import asave_video
+        return asave_video(self, storage, name, meta)
 
 
 class VideoCache(object):
@@ -220,6 +273,25 @@ class VideoCache(object):
         """Returns the URL of the given video asset."""
         return self._asset_cache.get_url(self._get_video_asset(*args, **kwargs), force_save=True)
 
+    def aget_url(self, *args, **kwargs):
+        """
+        Returns the URL of the given video asset, without blocking the event
+        loop.
+
+        Requires Python 3.5+.
+        """
+        return self._asset_cache.aget_url(self._get_video_asset(*args, **kwargs), force_save=True)
+
 
 # The default video cache.
 default_video_cache = VideoCache()
+
+
+register_recipe_loader("video", lambda recipe: default_video_cache._get_video_asset(
+    load_recipe(recipe["asset"]),
+    recipe["width"],
+    recipe["height"],
+    recipe["method"],
+    recipe["format"],
+    recipe["offset"],
+))
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+Benchmarks the hot paths of django-optimizations.
+
+The benchmarks run offline, against local storage, using generated
+fixtures. Results are written as JSON, so that releases can be compared for
+performance regressions.
+"""
+import sys, os.path, json, platform, random, shutil, tempfile, timeit
+from optparse import OptionParser
+
+
+def measure(func, number, repeat=5, setup=None):
+    """
+    Returns the best time per call of the given function, in seconds.
+
+    If setup is given, it is called before each call, and its return value
+    is passed to func. Setup time is not measured.
+    """
+    timer = timeit.default_timer
+    best = None
+    for _ in range(repeat):
+        elapsed = 0.0
+        for _ in range(number):
+            args = () if setup is None else (setup(),)
+            start = timer()
+            func(*args)
+            elapsed += timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / number
+
+
+def write_file(path, contents):
+    """Writes the given bytes to the given path, creating directories as required."""
+    dirname = os.path.dirname(path)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(path, "wb") as handle:
+        handle.write(contents)
+
+
+def make_fixtures(fixtures_dir):
+    """Generates the static fixtures used by the benchmarks."""
+    from PIL import Image, ImageDraw
+    # A large image with some detail.
+    rng = random.Random(0)
+    image = Image.new("RGB", (2000, 1500), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for _ in range(200):
+        x, y = rng.randint(0, 2000), rng.randint(0, 1500)
+        radius = rng.randint(10, 200)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    image_path = os.path.join(fixtures_dir, "img", "large.jpg")
+    write_file(image_path, b"")
+    image.save(image_path, "JPEG", quality=90)
+    # Some small images, referenced by the stylesheet.
+    for n in range(20):
+        write_file(os.path.join(fixtures_dir, "img", "icon{n}.svg".format(n=n)), "<svg xmlns='http://www.w3.org/2000/svg'><rect width='{n}' height='{n}'/></svg>".format(n=n + 1).encode("utf-8"))
+    # A stylesheet with lots of URLs.
+    rules = []
+    for n in range(500):
+        rules.append(".icon{n} {{ background: url(\"../img/icon{m}.svg\") no-repeat; color: #{n:03x}; margin: {n}px; }}".format(n=n, m=n % 20))
+    write_file(os.path.join(fixtures_dir, "css", "site.css"), "\n".join(rules).encode("utf-8"))
+    # Some javascript.
+    write_file(os.path.join(fixtures_dir, "js", "site.js"), b"function foo(bar) {\n    return bar + 1;\n}\n" * 100)
+
+
+def make_namespace_fixtures(namespaces_dir, count):
+    """Ensures that there are at least count files in the given static directory."""
+    for n in range(count):
+        path = os.path.join(namespaces_dir, "lib{dir}".format(dir=n // 1000), "file{n}.{ext}".format(n=n, ext=("js", "css", "png")[n % 3]))
+        if not os.path.exists(path):
+            write_file(path, b"")
+
+
+def run_benchmarks(options, fixtures_dir, namespaces_dir):
+    """Runs all the benchmarks, returning a dict of results."""
+    from django.core.files.storage import FileSystemStorage
+    from optimizations.assetcache import default_asset_cache, StaticAsset, freeze_dict
+    from optimizations.stylesheetcache import StylesheetAsset, tokenize_urls
+    from optimizations.thumbnailcache import default_thumbnail_cache, _methods
+    number = options.number
+    results = {}
+    def record(name, seconds, **params):
+        results[name] = dict(params, seconds_per_call=seconds)
+        if options.verbosity >= 1:
+            sys.stderr.write("{name}: {microseconds:.1f}us\n".format(
+                name = name,
+                microseconds = seconds * 1000000,
+            ))
+    # Asset cache.
+    asset_name = "css/site.css"
+    default_asset_cache.get_url(StaticAsset(asset_name))
+    record("asset_cache_get_url_hit", measure(
+        lambda asset: default_asset_cache.get_url(asset),
+        number * 10,
+        setup = lambda: StaticAsset(asset_name),
+    ))
+    # A cache miss for an asset that is already saved, so only hashing and the existence check are measured.
+    def clear_cache():
+        default_asset_cache._cache.clear()
+        return StaticAsset(asset_name)
+    record("asset_cache_get_url_cache_miss", measure(
+        lambda asset: default_asset_cache.get_url(asset),
+        number,
+        setup = clear_cache,
+    ))
+    # A cold build, where the asset is also hashed and saved.
+    saved_name = default_asset_cache.get_name(StaticAsset(asset_name))
+    def clear_storage():
+        default_asset_cache._storage.delete(saved_name)
+        default_asset_cache._remove_known_names((saved_name,))
+        return clear_cache()
+    record("asset_cache_get_url_cold", measure(
+        lambda asset: default_asset_cache.get_url(asset),
+        number,
+        setup = clear_storage,
+    ))
+    # Freezing dicts.
+    params = {"path": os.path.join(fixtures_dir, asset_name), "mtime": 1400000000.0, "width": 100, "height": -1, "method": "resize"}
+    record("freeze_dict", measure(lambda: freeze_dict(params), number * 100))
+    # Namespace loading.
+    for count in options.namespace_sizes:
+        make_namespace_fixtures(namespaces_dir, count)
+        def clear_namespaces():
+            StaticAsset._namespace_cache = None
+        record("load_namespaces_{count}".format(count=count), measure(
+            lambda _: StaticAsset._load_namespaces(),
+            1,
+            repeat = 3,
+            setup = clear_namespaces,
+        ), files=count)
+    # Thumbnailing.
+    thumbnail_storage = FileSystemStorage(location=tempfile.mkdtemp())
+    try:
+        image_name = "img/large.jpg"
+        for method in sorted(_methods):
+            for width in (100, 400, 1000):
+                def get_thumbnail_asset():
+                    return default_thumbnail_cache._get_thumbnail_asset(StaticAsset(image_name), width, width, method, None)
+                def save_thumbnail(thumbnail_asset):
+                    thumbnail_storage.delete("thumbnail.jpg")
+                    thumbnail_asset.save(thumbnail_storage, "thumbnail.jpg", thumbnail_asset.get_save_meta())
+                record("thumbnail_{method}_{width}".format(method=method, width=width), measure(
+                    save_thumbnail,
+                    max(number // 10, 1),
+                    setup = get_thumbnail_asset,
+                ), method=method, width=width, height=width)
+    finally:
+        shutil.rmtree(thumbnail_storage.location)
+    # Stylesheet URL rewriting.
+    with open(os.path.join(fixtures_dir, asset_name), "rb") as handle:
+        css_source = handle.read().decode("utf-8")
+    record("css_tokenize_urls", measure(lambda: tokenize_urls(css_source), number))
+    record("css_rewrite_urls", measure(
+        lambda asset: asset._get_uncompiled_contents(),
+        number,
+        setup = lambda: StylesheetAsset([StaticAsset(asset_name)], False),
+    ))
+    return results
+
+
+def main():
+    # Parse the command-line options.
+    parser = OptionParser()
+    parser.add_option("-v", "--verbosity",
+        action = "store",
+        dest = "verbosity",
+        default = "1",
+        type = "choice",
+        choices = ["0", "1"],
+        help = "Verbosity level; 0=minimal output, 1=normal output",
+    )
+    parser.add_option("-o", "--output",
+        action = "store",
+        dest = "output",
+        default = None,
+        help = "The path to write the JSON results to. Defaults to stdout.",
+    )
+    parser.add_option("-n", "--number",
+        action = "store",
+        dest = "number",
+        default = 100,
+        type = "int",
+        help = "The base number of calls per benchmark.",
+    )
+    parser.add_option("--namespace-sizes",
+        action = "store",
+        dest = "namespace_sizes",
+        default = "10000,100000",
+        help = "A comma-separated list of static file counts to benchmark namespace loading with.",
+    )
+    options, args = parser.parse_args()
+    options.verbosity = int(options.verbosity)
+    options.namespace_sizes = [int(size) for size in options.namespace_sizes.split(",") if size]
+    # Generate the fixtures.
+    temp_dir = tempfile.mkdtemp()
+    try:
+        fixtures_dir = os.path.join(temp_dir, "fixtures")
+        namespaces_dir = os.path.join(temp_dir, "namespaces")
+        os.makedirs(namespaces_dir)
+        make_fixtures(fixtures_dir)
+        # Configure Django.
+        from django.conf import settings
+        settings.configure(
+            DEBUG = False,
+            INSTALLED_APPS = (
+                "django.contrib.staticfiles",
+                "optimizations",
+            ),
+            CACHES = {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                },
+            },
+            STATIC_URL = "/static/",
+            STATIC_ROOT = os.path.join(temp_dir, "static"),
+            STATICFILES_DIRS = (
+                fixtures_dir,
+                namespaces_dir,
+            ),
+            STATIC_ASSETS = {
+                "default": {
+                    "js": {
+                        "include": ("lib*/*.js",),
+                    },
+                    "css": {
+                        "include": ("lib*/*.css",),
+                        "exclude": ("lib1*/*.css",),
+                    },
+                },
+            },
+            MEDIA_URL = "/media/",
+            MEDIA_ROOT = os.path.join(temp_dir, "media"),
+            USE_TZ = True,
+        )
+        # Run Django setup (1.7+).
+        import django
+        try:
+            django.setup()
+        except AttributeError:
+            pass  # This is Django < 1.7
+        from django.core.management import call_command
+        call_command("collectstatic", interactive=False, verbosity=0)
+        # Run the benchmarks.
+        results = run_benchmarks(options, fixtures_dir, namespaces_dir)
+    finally:
+        shutil.rmtree(temp_dir)
+    # Write the results.
+    output = json.dumps({
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "results": results,
+    }, indent=4, sort_keys=True)
+    if options.output is None:
+        sys.stdout.write(output + "\n")
+    else:
+        with open(options.output, "w") as handle:
+            handle.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
 """Tests for the asset cache."""
 
-import hashlib
+import gzip, hashlib, json, os, shutil, sys, tempfile, time, unittest
+from io import BytesIO
 
+from django.core.cache import get_cache, cache as default_cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
-from django.core.files.base import File
-from django.core.files.storage import default_storage
+from django.core.files.base import File, ContentFile
+from django.core.files.storage import default_storage, FileSystemStorage
 
-from optimizations.assetcache import default_asset_cache, FileAsset, staticfiles_storage
-from test_optimizations.tests.base import get_test_asset
+from optimizations.assetcache import default_asset_cache, AssetCache, FileAsset, StaticAsset, GroupedAsset, staticfiles_storage, freeze_dict, load_recipe, compress_gzip, brotli
+from optimizations.signals import asset_cache_lookup, asset_saved
+from optimizations.utils import atomic_write, save_file, copy_file, resolve_namespaced_cache
+from test_optimizations.tests.base import get_test_asset, get_test_stylesheet_asset, get_test_thumbnail_asset
+
+
+class OtherStorage(FileSystemStorage):
+
+    """A storage with a different class to default_storage."""
 
 
 class AssetCacheTest(TestCase):
@@ -33,3 +44,280 @@ class AssetCacheTest(TestCase):
         file = open(asset.get_path(), "rb")
         asset = FileAsset(File(open(asset.get_path(), "rb")))
         self.assertAssetWorks(asset, file)
+
+    def testGetUrls(self):
+        asset = get_test_asset()
+        url = default_asset_cache.get_url(asset)
+        self.assertEqual(default_asset_cache.get_urls([asset, asset]), [url, url])
+
+    def testPrecompress(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            storage = FileSystemStorage(location=temp_dir, base_url="/precompress/")
+            asset_cache = AssetCache(storage=storage, precompress={"gzip": 9})
+            # Saving a compressible asset saves a gzipped copy alongside it.
+            name = asset_cache.get_name(get_test_stylesheet_asset())
+            contents = storage.open(name).read()
+            self.assertEqual(gzip.GzipFile(fileobj=BytesIO(storage.open(name + ".gz").read())).read(), contents)
+            # Gzipped copies are reproducible.
+            self.assertEqual(storage.open(name + ".gz").read(), compress_gzip(contents, 9))
+            self.assertEqual(compress_gzip(contents, 9)[4:8], b"\0\0\0\0")
+            # Images are not compressible.
+            image_asset, _ = get_test_thumbnail_asset()
+            image_name = asset_cache.get_name(image_asset)
+            self.assertTrue(storage.exists(image_name))
+            self.assertFalse(storage.exists(image_name + ".gz"))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    @unittest.skipIf(brotli is None, "Brotli precompression requires the brotli library")
+    def testPrecompressBrotli(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            storage = FileSystemStorage(location=temp_dir, base_url="/precompress/")
+            asset_cache = AssetCache(storage=storage, precompress={"br": 11})
+            name = asset_cache.get_name(get_test_stylesheet_asset())
+            self.assertEqual(brotli.decompress(storage.open(name + ".br").read()), storage.open(name).read())
+            self.assertFalse(storage.exists(name + ".gz"))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testResolveNamespacedCache(self):
+        caches = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "optimizations": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "optimizations"},
+        }
+        # Unconfigured names fall back to the default cache, even if they are module paths.
+        self.assertTrue(resolve_namespaced_cache("optimizations.assetcache") is default_cache)
+        with self.settings(CACHES=caches):
+            self.assertFalse(resolve_namespaced_cache("optimizations.assetcache") is default_cache)
+            self.assertEqual(resolve_namespaced_cache("optimizations.assetcache")._cache, get_cache("optimizations")._cache)
+
+    @unittest.skipIf(sys.version_info < (3, 5), "Async support requires Python 3.5+")
+    def testAsyncGetUrl(self):
+        import asyncio
+        asset = get_test_asset()
+        url = default_asset_cache.get_url(asset)
+        self.assertEqual(asyncio.get_event_loop().run_until_complete(default_asset_cache.aget_url(asset)), url)
+
+    @unittest.skipIf(sys.version_info < (3, 5), "Async support requires Python 3.5+")
+    def testAsyncGetNameAndMeta(self):
+        import asyncio
+        asset = get_test_asset()
+        temp_dir = tempfile.mkdtemp()
+        lookups = []
+        saves = []
+        def record_lookup(sender, asset, hit, **kwargs):
+            lookups.append(hit)
+        def record_save(sender, asset, storage, name, duration, **kwargs):
+            saves.append(name)
+        asset_cache_lookup.connect(record_lookup)
+        asset_saved.connect(record_save)
+        try:
+            asset_cache = AssetCache(storage=FileSystemStorage(location=temp_dir), access_log_path=os.path.join(temp_dir, "access.log"), key_prefix=temp_dir)
+            aget_name_and_meta = lambda: asyncio.get_event_loop().run_until_complete(asset_cache.aget_name_and_meta(asset))
+            name, _ = aget_name_and_meta()
+            self.assertEqual(lookups, [False])
+            self.assertEqual(saves, [name])
+            self.assertTrue(asset_cache._storage.exists(name))
+            self.assertEqual(asset_cache.get_accessed_names(0), set((name,)))
+            # The name is now cached.
+            self.assertEqual(aget_name_and_meta()[0], name)
+            self.assertEqual(lookups, [False, True])
+            self.assertEqual(saves, [name])
+        finally:
+            asset_cache_lookup.disconnect(record_lookup)
+            asset_saved.disconnect(record_save)
+            shutil.rmtree(temp_dir)
+
+    def testFreezeDict(self):
+        self.assertEqual(
+            freeze_dict({"b": 1.5, "a": "foo"}),
+            hashlib.sha1(b"a=foo&b=1.5").hexdigest(),
+        )
+
+    def testAssetId(self):
+        asset = get_test_asset()
+        asset_id = asset.get_id()
+        self.assertEqual(StaticAsset(asset.get_name()).get_id(), asset_id)
+        # Grouped assets are identified by their sub-assets.
+        self.assertEqual(GroupedAsset([asset]).get_id(), GroupedAsset([StaticAsset(asset.get_name())]).get_id())
+        self.assertNotEqual(GroupedAsset([asset]).get_id(), GroupedAsset([asset, asset]).get_id())
+
+    def testKnownNamesIndex(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            index_path = os.path.join(temp_dir, "index.txt")
+            name = default_asset_cache.get_name(get_test_asset())
+            asset_cache = AssetCache(index_path=index_path)
+            self.assertTrue(asset_cache._exists(name))
+            self.assertFalse(asset_cache._exists(name + ".missing"))
+            # The index is persisted.
+            self.assertEqual(AssetCache(index_path=index_path)._get_known_names(), set((name,)))
+            # The index can be seeded from the storage.
+            asset_cache = AssetCache(index_path=index_path)
+            asset_cache.seed_index()
+            self.assertTrue(name in asset_cache._get_known_names())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testKnownNamesIndexTTL(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            index_path = os.path.join(temp_dir, "index.txt")
+            name = default_asset_cache.get_name(get_test_asset())
+            asset_cache = AssetCache(index_path=index_path)
+            expiring_asset_cache = AssetCache(index_path=index_path, index_ttl=-1)
+            for cache in (asset_cache, expiring_asset_cache):
+                self.assertTrue(cache._exists(name))
+            # Names removed by another process stay known until the index is reloaded.
+            AssetCache(index_path=index_path)._remove_known_names((name,))
+            self.assertTrue(name in asset_cache._get_known_names())
+            self.assertFalse(name in expiring_asset_cache._get_known_names())
+            # The TTL can be set in the settings.
+            with self.settings(OPTIMIZATIONS_ASSET_CACHE_INDEX_TTL=60):
+                self.assertEqual(AssetCache()._index_ttl, 60)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testAtomicWrite(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "foo", "bar.txt")
+            # Failed writes leave nothing behind.
+            with self.assertRaises(ValueError):
+                with atomic_write(path) as temp_path:
+                    with open(temp_path, "wb") as handle:
+                        handle.write(b"foo")
+                    raise ValueError
+            self.assertEqual(os.listdir(os.path.dirname(path)), [])
+            # Successful writes are renamed into place.
+            with atomic_write(path) as temp_path:
+                with open(temp_path, "wb") as handle:
+                    handle.write(b"foo")
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["bar.txt"])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testSaveFile(self):
+        name = "assets/test_save_file.txt"
+        try:
+            save_file(default_storage, name, ContentFile(b"foo"))
+            save_file(default_storage, name, ContentFile(b"bar"))
+            self.assertEqual(default_storage.open(name).read(), b"bar")
+        finally:
+            default_storage.delete(name)
+
+    def testCopyFile(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            src_path = os.path.join(temp_dir, "foo.bin")
+            contents = os.urandom(1024 * 1024 + 1)
+            with open(src_path, "wb") as handle:
+                handle.write(contents)
+            dst_path = os.path.join(temp_dir, "bar", "foo.bin")
+            copy_file(src_path, dst_path)
+            with open(dst_path, "rb") as handle:
+                self.assertEqual(handle.read(), contents)
+            # Hardlinks are optional.
+            with self.settings(OPTIMIZATIONS_HARDLINK_ASSETS=True):
+                link_path = os.path.join(temp_dir, "bar", "baz.bin")
+                copy_file(src_path, link_path)
+                copy_file(src_path, link_path)
+            self.assertTrue(os.path.samefile(src_path, link_path))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testAccessLog(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            access_log_path = os.path.join(temp_dir, "access.log")
+            asset_cache = AssetCache(access_log_path=access_log_path)
+            name = asset_cache.get_name(get_test_asset())
+            self.assertEqual(asset_cache.get_accessed_names(0), set((name,)))
+            self.assertEqual(asset_cache.get_accessed_names(time.time() + 60), set())
+            # Compacting the log removes old entries.
+            asset_cache.compact_access_log(time.time() + 60)
+            self.assertEqual(asset_cache.get_accessed_names(0), set())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testCleanAssets(self):
+        temp_dir = tempfile.mkdtemp()
+        access_log_path = default_asset_cache._access_log_path
+        default_asset_cache._access_log_path = os.path.join(temp_dir, "access.log")
+        try:
+            live_name = default_asset_cache.get_name(get_test_asset())
+            dead_name = "assets/de/dead.txt"
+            default_storage.save(dead_name, ContentFile(b"foo"))
+            # A stylesheet in the manifest, referencing an image that is never looked up.
+            image_name = "assets/im/image.png"
+            default_storage.save(image_name, ContentFile(b"foo"))
+            stylesheet_name = "assets/st/live.css"
+            default_storage.save(stylesheet_name, ContentFile(".foo{{background:url({url})}}".format(
+                url = default_storage.url(image_name),
+            ).encode("utf-8")))
+            manifest_path = os.path.join(temp_dir, "manifest.json")
+            with open(manifest_path, "w") as handle:
+                json.dump({"stylesheet:default": [default_storage.url(stylesheet_name)]}, handle)
+            # Make all files old.
+            old_time = time.time() - 30 * 24 * 60 * 60
+            for name in (live_name, dead_name, image_name, stylesheet_name):
+                os.utime(default_storage.path(name), (old_time, old_time))
+            # The access log must be shared, and the grace period must cover the access log interval.
+            self.assertRaises(CommandError, call_command, "cleanassets", verbosity=0)
+            self.assertRaises(CommandError, call_command, "cleanassets", shared_access_log=True, grace_period=1.5, verbosity=0)
+            # A dry run deletes nothing.
+            call_command("cleanassets", shared_access_log=True, manifest=manifest_path, dry_run=True, verbosity=0)
+            self.assertTrue(default_storage.exists(dead_name))
+            # Unused files are deleted.
+            call_command("cleanassets", shared_access_log=True, manifest=manifest_path, verbosity=0)
+            self.assertFalse(default_storage.exists(dead_name))
+            self.assertTrue(default_storage.exists(live_name))
+            self.assertTrue(default_storage.exists(stylesheet_name))
+            self.assertTrue(default_storage.exists(image_name))
+            for name in (image_name, stylesheet_name):
+                default_storage.delete(name)
+        finally:
+            default_asset_cache._access_log_path = access_log_path
+            shutil.rmtree(temp_dir)
+
+    def testRecipes(self):
+        asset = get_test_asset()
+        self.assertEqual(load_recipe(asset.get_recipe()).get_id(), asset.get_id())
+        name = "assets/test_recipe.txt"
+        default_storage.save(name, ContentFile(b"foo"))
+        try:
+            asset = load_recipe({"type": "file", "name": name})
+            self.assertEqual(asset.get_recipe(), {"type": "file", "name": name})
+            self.assertEqual(asset.get_contents(), b"foo")
+            self.assertEqual(asset.get_id(), FileAsset(load_recipe(asset.get_recipe())._file).get_id())
+        finally:
+            default_storage.delete(name)
+        self.assertRaises(NotImplementedError, GroupedAsset([asset]).get_recipe)
+        self.assertRaises(ValueError, load_recipe, {"type": "foo"})
+
+    def testWarmAssets(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            access_log_path = os.path.join(temp_dir, "access.log")
+            asset = get_test_asset()
+            AssetCache(access_log_path=access_log_path).get_name(asset)
+            default_asset_cache._cache.delete(default_asset_cache.get_cache_key(asset))
+            call_command("warmassets", access_log=access_log_path, verbosity=0)
+            self.assertTrue(default_asset_cache._cache.get(default_asset_cache.get_cache_key(asset)) is not None)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testCacheKeyNamespace(self):
+        asset = get_test_asset()
+        cache_key = AssetCache().get_cache_key(asset)
+        self.assertEqual(AssetCache().get_cache_key(asset), cache_key)
+        self.assertTrue(AssetCache(key_prefix="staging:").get_cache_key(asset).startswith("staging:"))
+        self.assertNotEqual(AssetCache(key_version=2).get_cache_key(asset), cache_key)
+        self.assertNotEqual(AssetCache(prefix="other").get_cache_key(asset), cache_key)
+        with self.settings(OPTIMIZATIONS_MINIFIER="optimizations.minifiers.RMinifier"):
+            self.assertNotEqual(AssetCache().get_cache_key(asset), cache_key)
+        # Lazy storages are namespaced by the storage they wrap.
+        self.assertEqual(AssetCache(storage=FileSystemStorage()).get_cache_key(asset), cache_key)
+        self.assertNotEqual(AssetCache(storage=OtherStorage()).get_cache_key(asset), cache_key)
@@ -0,0 +1,88 @@
+"""Tests for the asset compiler."""
+
+import os, shutil, tempfile
+
+from django.test import TestCase
+from django.core.files.storage import default_storage
+
+from optimizations.assetcache import default_asset_cache
+from optimizations.assetcompiler import AssetCompiler, AssetCompilerPluginBase, load_build_state, save_build_state
+from optimizations.assetmanifest import get_manifest_key
+from test_optimizations.tests.base import get_test_asset
+
+
+class RecordingPlugin(AssetCompilerPluginBase):
+
+    def __init__(self):
+        self.compiled = []
+
+    def compile_assets(self, assets):
+        self.compiled.append(assets)
+        return [asset.get_name() for asset in assets]
+
+
+class AssetCachePlugin(RecordingPlugin):
+
+    def compile_assets(self, assets):
+        self.compiled.append(assets)
+        return [default_asset_cache.get_url(asset, force_save=True) for asset in assets]
+
+
+class AssetCompilerTest(TestCase):
+
+    def testIncrementalCompile(self):
+        plugin = RecordingPlugin()
+        asset_compiler = AssetCompiler()
+        asset_compiler.register_plugin("test", plugin)
+        # Unnamespaced asset names are loaded as single assets.
+        namespace = get_test_asset().get_name()
+        key = get_manifest_key("test", namespace)
+        build_state = {}
+        # A dry run compiles nothing.
+        self.assertEqual(len(list(asset_compiler.compile_iter(namespace, {}, build_state, dry_run=True))), 1)
+        self.assertEqual(plugin.compiled, [])
+        self.assertEqual(build_state, {})
+        # The first compile compiles everything.
+        manifest = {}
+        self.assertEqual(len(asset_compiler.compile(namespace, manifest, build_state)), 1)
+        self.assertEqual(len(plugin.compiled), 1)
+        self.assertEqual(manifest[key], [namespace])
+        # The second compile is up to date.
+        manifest = {}
+        self.assertEqual(asset_compiler.compile(namespace, manifest, build_state), [])
+        self.assertEqual(len(plugin.compiled), 1)
+        self.assertEqual(manifest[key], [namespace])
+        # Changed build params are recompiled.
+        build_state[key]["digest"] = "changed"
+        self.assertEqual(len(asset_compiler.compile(namespace, {}, build_state)), 1)
+        self.assertEqual(len(plugin.compiled), 2)
+
+    def testIncrementalCompileMissingOutput(self):
+        plugin = AssetCachePlugin()
+        asset_compiler = AssetCompiler()
+        asset_compiler.register_plugin("test", plugin)
+        asset = get_test_asset()
+        namespace = asset.get_name()
+        build_state = {}
+        self.assertEqual(len(asset_compiler.compile(namespace, {}, build_state)), 1)
+        self.assertEqual(asset_compiler.compile(namespace, {}, build_state), [])
+        self.assertEqual(len(plugin.compiled), 1)
+        # The asset cache settings are part of the build params.
+        self.assertEqual(plugin.get_build_params([asset])["asset_cache"], default_asset_cache._key_namespace)
+        # Missing output is recompiled, and saved again.
+        name = default_asset_cache.get_name(asset)
+        default_storage.delete(name)
+        self.assertEqual(len(asset_compiler.compile(namespace, {}, build_state)), 1)
+        self.assertEqual(len(plugin.compiled), 2)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(asset_compiler.compile(namespace, {}, build_state), [])
+
+    def testBuildState(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "build.json")
+            self.assertEqual(load_build_state(path), {})
+            save_build_state(path, {"foo": {"digest": "bar", "urls": []}})
+            self.assertEqual(load_build_state(path), {"foo": {"digest": "bar", "urls": []}})
+        finally:
+            shutil.rmtree(temp_dir)
@@ -0,0 +1,38 @@
+"""Tests for the asset manifest."""
+
+import os, shutil, tempfile
+
+from django.test import TestCase
+
+from optimizations.assetmanifest import AssetManifest, get_manifest_key
+
+
+class AssetManifestTest(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "manifest.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def testAssetManifest(self):
+        AssetManifest(self.path).save({
+            get_manifest_key("js", "default"): ["/media/assets/foo.js"],
+        })
+        manifest = AssetManifest(self.path)
+        self.assertEqual(manifest.get_urls("js", "default"), ["/media/assets/foo.js"])
+        self.assertEqual(manifest.get_urls("js", ("default",)), ["/media/assets/foo.js"])
+        self.assertEqual(manifest.get_urls("css", "default"), None)
+        self.assertEqual(manifest.get_urls("js", ("default", "other")), None)
+
+    def testMissingAssetManifest(self):
+        self.assertEqual(AssetManifest(self.path).get_urls("js", "default"), None)
+
+    def testSaveAssetManifest(self):
+        manifest = AssetManifest(self.path)
+        manifest.save({get_manifest_key("js", "default"): ["/media/assets/foo.js"]})
+        manifest.save({get_manifest_key("js", "default"): ["/media/assets/bar.js"]})
+        self.assertEqual(AssetManifest(self.path).get_urls("js", "default"), ["/media/assets/bar.js"])
+        # No temporary files are left behind.
+        self.assertEqual(os.listdir(self.temp_dir), ["manifest.json"])
@@ -1,11 +1,82 @@
 """Tests for the javascript compiler."""
 
+import unittest
+
+try:
+    import rjsmin, rcssmin
+except ImportError:
+    rjsmin = rcssmin = None
+
+from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
+from django.test.utils import override_settings
+
+from optimizations.javascriptcompiler import default_javascript_compiler, JavascriptCompiler
+from optimizations.minifiers import MinifierBase, CommandMinifier, MinifierError, get_minifier, JS, CSS
+
+
+class CountingMinifier(MinifierBase):
+
+    """A minifier that counts its calls, and leaves the source unchanged."""
+
+    count = 0
+
+    def minify(self, source, type):
+        CountingMinifier.count += 1
+        return source
 
-from optimizations.javascriptcompiler import default_javascript_compiler
+
+class UpperCaseMinifier(MinifierBase):
+
+    """A minifier that upper-cases the source."""
+
+    def minify(self, source, type):
+        return source.upper()
 
 
 class JavascriptCompilerTest(TestCase):
     
     def testJavascriptCompiler(self):
-        self.assertEqual(default_javascript_compiler.compile("function(){var foo = 'foo';}"), b'function(){var a="foo"};')
\ No newline at end of file
+        self.assertEqual(default_javascript_compiler.compile("function(){var foo = 'foo';}"), b'function(){var a="foo"};')
+
+    def testJavascriptCompilerCache(self):
+        CountingMinifier.count = 0
+        compiler = JavascriptCompiler(minifier="test_optimizations.tests.test_javascriptcompiler.CountingMinifier")
+        source = b"function(){var foo = 'foo';}"
+        self.assertEqual(compiler.compile(source, force_compile=True), source)
+        self.assertEqual(CountingMinifier.count, 1)
+        # Subsequent compiles should come from the cache.
+        self.assertEqual(compiler.compile(source, force_compile=True), source)
+        self.assertEqual(CountingMinifier.count, 1)
+        # Changed source is compiled again.
+        self.assertEqual(compiler.compile(source + b";", force_compile=True), source + b";")
+        self.assertEqual(CountingMinifier.count, 2)
+        # Debug mode skips the minifier.
+        self.assertEqual(compiler.compile(b"var bar;", force_compile=False), b"var bar;")
+        self.assertEqual(CountingMinifier.count, 2)
+
+    def testJavascriptCompilerMinifier(self):
+        compiler = JavascriptCompiler(minifier="test_optimizations.tests.test_javascriptcompiler.CountingMinifier")
+        source = b"function(){var foo = 'foo';}"
+        # The cache key depends on the minifier options.
+        self.assertNotEqual(
+            compiler.get_cache_key(source, get_minifier("test_optimizations.tests.test_javascriptcompiler.CountingMinifier")),
+            compiler.get_cache_key(source, CommandMinifier({JS: ("cat",)})),
+        )
+        self.assertRaises(ImproperlyConfigured, lambda: JavascriptCompiler(minifier="test_optimizations.tests.missing.Minifier").compile(source, force_compile=True))
+
+    @override_settings(OPTIMIZATIONS_MINIFIER="test_optimizations.tests.test_javascriptcompiler.UpperCaseMinifier")
+    def testMinifierSetting(self):
+        self.assertEqual(JavascriptCompiler().compile(b"var foo;", force_compile=True), b"VAR FOO;")
+
+    @unittest.skipUnless(rjsmin and rcssmin, "rjsmin and rcssmin are not installed")
+    def testRMinifier(self):
+        minifier = get_minifier("optimizations.minifiers.RMinifier")
+        self.assertEqual(minifier.minify(b"function foo(bar) {\n    return bar + 1;\n}\n", JS), b"function foo(bar){return bar+1;}")
+        self.assertEqual(minifier.minify("a {\n    color: red;\n    content: \"\u2713\";\n}\n".encode("utf-8"), CSS), "a{color:red;content:\"\u2713\"}".encode("utf-8"))
+        self.assertRaises(MinifierError, lambda: minifier.minify(b"", "html"))
+
+    def testCommandMinifier(self):
+        minifier = CommandMinifier({JS: ("cat",)})
+        self.assertEqual(minifier.minify(b"var foo = 'foo';", JS), b"var foo = 'foo';")
+        self.assertRaises(MinifierError, lambda: minifier.minify(b"* {}", CSS))
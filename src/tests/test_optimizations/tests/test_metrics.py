@@ -0,0 +1,33 @@
+"""Tests for the asset cache metrics."""
+
+from django.test import TestCase
+
+from optimizations.assetcache import default_asset_cache
+from optimizations.metrics import get_metrics, connect_metrics, PrometheusMetrics
+from optimizations.signals import asset_cache_lookup
+from test_optimizations.tests.base import get_test_asset
+
+
+class MetricsTest(TestCase):
+
+    def testAssetCacheLookupSignal(self):
+        lookups = []
+        def receiver(sender, asset, hit, **kwargs):
+            lookups.append((sender, hit))
+        asset_cache_lookup.connect(receiver)
+        try:
+            asset = get_test_asset()
+            default_asset_cache.get_name(asset)
+            self.assertEqual(lookups[-1], (asset.__class__, True))
+        finally:
+            asset_cache_lookup.disconnect(receiver)
+
+    def testPrometheusMetrics(self):
+        with self.settings(OPTIMIZATIONS_METRICS="optimizations.metrics.PrometheusMetrics"):
+            connect_metrics()
+            metrics = get_metrics()
+            self.assertTrue(isinstance(metrics, PrometheusMetrics))
+            default_asset_cache.get_name(get_test_asset())
+            self.assertTrue('optimizations_lookups_total{asset_type="StaticAsset"}' in metrics.render())
+            metrics.timing("build", "StaticAsset", 0.5)
+            self.assertTrue('optimizations_build_seconds_count{asset_type="StaticAsset"}' in metrics.render())
@@ -1,5 +1,7 @@
 """Tests for the property cache."""
 
+import copy, pickle, threading, time
+
 from django.test import TestCase
 
 import optimizations
@@ -30,6 +32,70 @@ class CachedPropertyTestObj(object):
         return "baz"
 
 
+class CachedAttributeTestObj(object):
+
+    def __init__(self):
+        self._get_count = 0
+
+    @optimizations.cached_attribute
+    def name(self):
+        self._get_count += 1
+        return "foo"
+
+    @optimizations.cached_attribute(lock=True)
+    def locked_name(self):
+        self._get_count += 1
+        return "bar"
+
+
+class ShadowedCachedAttributeTestObj(CachedAttributeTestObj):
+
+    name = "shadowed"
+
+
+class SlowCachedAttributeTestObj(object):
+
+    def __init__(self):
+        self._get_count = 0
+
+    @optimizations.cached_attribute(lock=True)
+    def name(self):
+        self._get_count += 1
+        time.sleep(0.05)
+        return "foo"
+
+
+class CachedAttributeSlotsTestObj(object):
+
+    __slots__ = ("_name_cache",)
+
+    @optimizations.cached_attribute(slot="_name_cache")
+    def name(self):
+        return "foo"
+
+
+class ExpiringCachedPropertyTestObj(object):
+
+    def __init__(self, pk=None):
+        self.pk = pk
+        self._get_count = 0
+
+    @optimizations.timed_cached_property(60)
+    def timed(self):
+        self._get_count += 1
+        return "foo"
+
+    @optimizations.timed_cached_property(0)
+    def expired(self):
+        self._get_count += 1
+        return "bar"
+
+    @optimizations.shared_cached_property()
+    def shared(self):
+        self._get_count += 1
+        return self.pk
+
+
 class OptimizationsTest(TestCase):
 
     def testCachedProperty(self):
@@ -67,4 +133,134 @@ class OptimizationsTest(TestCase):
         self.assertRaises(AttributeError, set_read_only)
         def del_read_only():
             del obj.read_only
-        self.assertRaises(AttributeError, del_read_only)
\ No newline at end of file
+        self.assertRaises(AttributeError, del_read_only)
+
+    def testCachedAttribute(self):
+        obj = CachedAttributeTestObj()
+        # Call the getter.
+        self.assertEqual(obj.name, "foo")
+        self.assertEqual(obj.name, "foo")
+        self.assertEqual(obj._get_count, 1)
+        self.assertEqual(obj.__dict__["name"], "foo")
+        # Set the value.
+        obj.name = "bar"
+        self.assertEqual(obj.name, "bar")
+        # Clear the value.
+        del obj.name
+        self.assertEqual(obj.name, "foo")
+        self.assertEqual(obj._get_count, 2)
+        # Check the locked property.
+        self.assertEqual(obj.locked_name, "bar")
+        self.assertEqual(obj.locked_name, "bar")
+        self.assertEqual(obj._get_count, 3)
+
+    def testCachedAttributeLock(self):
+        obj = SlowCachedAttributeTestObj()
+        values = []
+        threads = [threading.Thread(target=lambda: values.append(obj.name)) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(values, ["foo"] * 10)
+        self.assertEqual(obj._get_count, 1)
+        # The lock is not left on the instance, so it can be pickled and copied.
+        self.assertEqual(pickle.loads(pickle.dumps(obj)).name, "foo")
+        self.assertEqual(copy.deepcopy(obj).name, "foo")
+        # The value is generated again once cleared.
+        del obj.name
+        self.assertEqual(obj.name, "foo")
+        self.assertEqual(obj._get_count, 2)
+        self.assertEqual(pickle.loads(pickle.dumps(obj)).name, "foo")
+
+    def testCachedAttributeSlots(self):
+        obj = CachedAttributeSlotsTestObj()
+        self.assertEqual(obj.name, "foo")
+        self.assertEqual(obj._name_cache, "foo")
+        # Set the value.
+        obj.name = "bar"
+        self.assertEqual(obj.name, "bar")
+        self.assertEqual(obj._name_cache, "bar")
+        # Clear the value.
+        del obj.name
+        self.assertRaises(AttributeError, lambda: obj._name_cache)
+        self.assertEqual(obj.name, "foo")
+
+    def testTimedCachedProperty(self):
+        obj = ExpiringCachedPropertyTestObj()
+        self.assertEqual(obj.timed, "foo")
+        self.assertEqual(obj.timed, "foo")
+        self.assertEqual(obj._get_count, 1)
+        self.assertEqual(obj.expired, "bar")
+        self.assertEqual(obj.expired, "bar")
+        self.assertEqual(obj._get_count, 3)
+        # Set the value.
+        obj.timed = "baz"
+        self.assertEqual(obj.timed, "baz")
+        self.assertEqual(obj._get_count, 3)
+        # Set an expired value.
+        obj.expired = "baz"
+        self.assertEqual(obj.expired, "bar")
+        self.assertEqual(obj._get_count, 4)
+        # Clear the value.
+        del obj.timed
+        self.assertEqual(obj.timed, "foo")
+        self.assertEqual(obj._get_count, 5)
+
+    def testSharedCachedProperty(self):
+        obj = ExpiringCachedPropertyTestObj(pk=1)
+        del obj.shared
+        self.assertEqual(obj.shared, 1)
+        self.assertEqual(obj._get_count, 1)
+        # A different instance with the same pk should use the shared value.
+        obj = ExpiringCachedPropertyTestObj(pk=1)
+        self.assertEqual(obj.shared, 1)
+        self.assertEqual(obj._get_count, 0)
+        # Deleting clears the shared value.
+        del obj.shared
+        self.assertEqual(obj.shared, 1)
+        self.assertEqual(obj._get_count, 1)
+        # Setting replaces the value on the object, and clears the shared value.
+        obj.shared = 2
+        self.assertEqual(obj.shared, 2)
+        obj = ExpiringCachedPropertyTestObj(pk=1)
+        self.assertEqual(obj.shared, 1)
+        self.assertEqual(obj._get_count, 1)
+
+    def testClearCachedProperties(self):
+        obj = CachedPropertyTestObj("foo")
+        self.assertEqual(obj.name, "foo")
+        self.assertEqual(obj.read_only, "baz")
+        self.assertEqual(obj._get_count, 2)
+        # Clear a single property.
+        optimizations.clear_cached_properties(obj, "read_only")
+        self.assertEqual(obj.name, "foo")
+        self.assertEqual(obj.read_only, "baz")
+        self.assertEqual(obj._get_count, 3)
+        # Clear all properties.
+        optimizations.clear_cached_properties(obj)
+        self.assertEqual(obj.name, "foo")
+        self.assertEqual(obj.read_only, "baz")
+        self.assertEqual(obj._get_count, 5)
+
+    def testClearCachedPropertiesShadowed(self):
+        obj = ShadowedCachedAttributeTestObj()
+        self.assertEqual(obj.name, "shadowed")
+        self.assertEqual(obj.locked_name, "bar")
+        # Shadowed cached properties are skipped.
+        optimizations.clear_cached_properties(obj)
+        self.assertEqual(obj.name, "shadowed")
+        self.assertEqual(obj.locked_name, "bar")
+        self.assertEqual(obj._get_count, 2)
+        self.assertRaises(TypeError, optimizations.clear_cached_properties, obj, "name")
+
+    def testPrefetchCachedProperty(self):
+        objs = [CachedAttributeTestObj(), CachedAttributeTestObj()]
+        optimizations.prefetch_cached_property(objs, "name", lambda objs: ["foo", "bar"])
+        self.assertEqual([obj.name for obj in objs], ["foo", "bar"])
+        self.assertEqual([obj._get_count for obj in objs], [0, 0])
+        # Prefetch using a dict of primary keys.
+        objs = [ExpiringCachedPropertyTestObj(pk=1), ExpiringCachedPropertyTestObj(pk=2)]
+        optimizations.prefetch_cached_property(objs, "timed", lambda objs: {1: "foo"}, default="bar")
+        self.assertEqual([obj.timed for obj in objs], ["foo", "bar"])
+        self.assertEqual([obj._get_count for obj in objs], [0, 0])
@@ -0,0 +1,100 @@
+"""Tests for the stylesheet cache."""
+
+import os
+
+from django.test import TestCase
+from django.core.files.base import ContentFile
+
+from optimizations.assetcache import default_asset_cache, StaticAsset, staticfiles_storage
+from optimizations.stylesheetcache import StylesheetAsset, tokenize_urls, format_url, make_data_uri
+
+
+class StylesheetCacheTest(TestCase):
+
+    def testTokenizeUrls(self):
+        self.assertEqual(
+            tokenize_urls("a{background:url( 'a.png' )} @import url(\"b.css\"); b{color:rgba(0,0,0,0);background:URL(c.gif?d#e)}"),
+            [
+                "a{background:",
+                (False, "a.png"),
+                "} ",
+                (True, "b.css"),
+                "; b{color:rgba(0,0,0,0);background:",
+                (False, "c.gif?d#e"),
+                "}",
+            ],
+        )
+
+    def testTokenizeStringImports(self):
+        self.assertEqual(
+            tokenize_urls("@import 'a.css' screen; @import \"b.css\";"),
+            ["", (True, "a.css"), " screen; ", (True, "b.css"), ";"],
+        )
+
+    def testFormatUrl(self):
+        self.assertEqual(format_url(False, "/a.png"), "url(/a.png)")
+        self.assertEqual(format_url(True, "/b.css"), "@import url(/b.css)")
+
+    def testMakeDataUri(self):
+        self.assertEqual(make_data_uri("image/png", b"foo"), "data:image/png;base64,Zm9v")
+        self.assertEqual(make_data_uri("image/svg+xml", b"<svg a='b'/>"), "data:image/svg+xml,%3Csvg%20a=%27b%27/%3E")
+
+    def testInlineImports(self):
+        asset = StylesheetAsset([StaticAsset("stylesheets/imports.css")], False, inline_imports=True)
+        contents = asset._get_uncompiled_contents().decode("utf-8")
+        # Imports that can't be inlined are hoisted to the top, in order.
+        self.assertTrue(contents.startswith(
+            "@import url(http://example.com/nested.css) screen;\n"
+            "@import url({print_url}) screen;\n"
+            "@import url(http://example.com/remote.css);\n"
+            "@import url(/static/stylesheets/missing.css) print;\n".format(
+                print_url = default_asset_cache.get_url("stylesheets/print.css"),
+            )
+        ))
+        self.assertEqual(contents.count("@import"), 4)
+        # Local imports are inlined, wrapped in their media query.
+        self.assertRegexpMatches(contents, r"@media screen \{\s*\.imported\{color:blue\}\s*\}")
+        self.assertIn(".imports{color:red}", contents)
+        self.assertNotIn(".print", contents)
+        # The cyclic import is dropped.
+        self.assertNotIn("imports.css", contents)
+        self.assertEqual(asset._tokens_and_imported_assets[1][0].get_name(), "stylesheets/imported.css")
+
+    def testInlineImportsDisabled(self):
+        asset = StylesheetAsset([StaticAsset("stylesheets/imported.css")], False)
+        contents = asset._get_uncompiled_contents().decode("utf-8")
+        self.assertTrue(contents.startswith("@import url({imports_url});\n@import url(http://example.com/nested.css);\n".format(
+            imports_url = default_asset_cache.get_url("stylesheets/imports.css"),
+        )))
+
+    def testInlineDataUris(self):
+        png_size = staticfiles_storage.size("test.png")
+        with staticfiles_storage.open("stylesheets/icon.svg") as handle:
+            svg_data_uri = make_data_uri("image/svg+xml", handle.read())
+        # Files exactly the maximum size are inlined.
+        contents = StylesheetAsset([StaticAsset("stylesheets/images.css")], False, inline_max_size=png_size)._get_uncompiled_contents().decode("utf-8")
+        self.assertIn("url(data:image/png;base64,", contents)
+        # SVG files are percent-encoded.
+        self.assertTrue(svg_data_uri.startswith("data:image/svg+xml,%3Csvg"))
+        self.assertIn("url({svg_data_uri})".format(svg_data_uri=svg_data_uri), contents)
+        # Files one byte larger are not.
+        contents = StylesheetAsset([StaticAsset("stylesheets/images.css")], False, inline_max_size=png_size - 1)._get_uncompiled_contents().decode("utf-8")
+        self.assertNotIn("data:image/png", contents)
+        self.assertIn("url({png_url})".format(png_url=default_asset_cache.get_url("test.png")), contents)
+        self.assertIn("url({svg_data_uri})".format(svg_data_uri=svg_data_uri), contents)
+
+    def testInlineDataUrisHash(self):
+        stylesheet_name = staticfiles_storage.save("stylesheets/edited/edited.css", ContentFile(b".a{background:url(edited.svg)}"))
+        image_name = staticfiles_storage.save("stylesheets/edited/edited.svg", ContentFile(b"<svg/>"))
+        try:
+            get_save_name = lambda: default_asset_cache._get_save_name(StylesheetAsset([StaticAsset(stylesheet_name)], False, inline_max_size=1024))
+            save_name = get_save_name()
+            # Editing an inlined file changes the name of the stylesheet.
+            with staticfiles_storage.open(image_name, "wb") as handle:
+                handle.write(b"<svg><rect/></svg>")
+            mtime = os.path.getmtime(staticfiles_storage.path(image_name)) + 10
+            os.utime(staticfiles_storage.path(image_name), (mtime, mtime))
+            self.assertNotEqual(get_save_name(), save_name)
+        finally:
+            staticfiles_storage.delete(stylesheet_name)
+            staticfiles_storage.delete(image_name)
@@ -1,6 +1,9 @@
 """Tests for the template tags."""
 
+import os, shutil, tempfile, time
+
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.template import Template, Context
 
 from optimizations.assetcache import default_asset_cache
@@ -8,6 +11,7 @@ from optimizations.thumbnailcache import default_thumbnail_cache
 from optimizations.javascriptcache import default_javascript_cache
 from test_optimizations.tests.base import get_test_asset, get_test_thumbnail_asset, get_test_stylesheet_asset, get_test_javascript_asset
 from optimizations.stylesheetcache import default_stylesheet_cache
+from optimizations.templatetags._compatibility import CompatibilityNode, InclusionNode
 
 
 class OptimizationsTemplateTagsTest(TestCase):
@@ -22,6 +26,41 @@ class OptimizationsTemplateTagsTest(TestCase):
             url,
         )
         
+    def testAssetTagLiteral(self):
+        asset = get_test_asset()
+        url = default_asset_cache.get_url(asset.get_name())
+        template = Template("{% load assets %}{% asset '" + asset.get_name() + "' %}")
+        node = template.nodelist.get_nodes_by_type(CompatibilityNode)[0]
+        self.assertTrue(node._cache_result)
+        self.assertEqual(template.render(Context({})), url)
+        self.assertEqual(template.render(Context({})), url)
+        # Variable arguments should not be cached.
+        template = Template("{% load assets %}{% asset asset %}")
+        node = template.nodelist.get_nodes_by_type(CompatibilityNode)[0]
+        self.assertFalse(node._cache_result)
+
+    def testAssetTagLiteralAccessLog(self):
+        asset = get_test_asset()
+        temp_dir = tempfile.mkdtemp()
+        access_log_path = default_asset_cache._access_log_path
+        default_asset_cache._access_log_path = os.path.join(temp_dir, "access.log")
+        try:
+            name = default_asset_cache.get_name(asset)
+            for template in (
+                Template("{% load assets %}{% asset '" + asset.get_name() + "' %}"),
+                Template("{% load assets %}{% get_asset '" + asset.get_name() + "' as url %}{{url}}"),
+            ):
+                template.render(Context({}))
+                # Reusing the cached result still records access, so cleanassets keeps the file.
+                default_asset_cache._accessed_names.clear()
+                default_asset_cache.compact_access_log(time.time() + 60)
+                self.assertEqual(default_asset_cache.get_accessed_names(0), set())
+                template.render(Context({}))
+                self.assertEqual(default_asset_cache.get_accessed_names(0), set((name,)))
+        finally:
+            default_asset_cache._access_log_path = access_log_path
+            shutil.rmtree(temp_dir)
+
     def testGetAssetTag(self):
         asset = get_test_asset()
         url = default_asset_cache.get_url(asset)
@@ -99,3 +138,55 @@ class OptimizationsTemplateTagsTest(TestCase):
             Template("{% load assets %}{% script 'http://www.example.com/example.js' %}").render(Context({})),
             '<script src="http://www.example.com/example.js"></script>',
         )
+
+    def testFastTemplateTags(self):
+        asset, image_size = get_test_thumbnail_asset()
+        template = Template(
+            "{% load assets %}"
+            "{% script 'http://www.example.com/example.js' defer='defer' %}"
+            "{% stylesheet 'http://www.example.com/example.css' media='<screen>' %}"
+            "{% img asset alt='foo & bar' %}"
+        )
+        context = {"asset": asset}
+        with override_settings(OPTIMIZATIONS_FAST_TEMPLATE_TAGS=False):
+            html = template.render(Context(context))
+        with override_settings(OPTIMIZATIONS_FAST_TEMPLATE_TAGS=True):
+            self.assertEqual(template.render(Context(context)), html)
+
+    def testFastTemplateTagsAutoescape(self):
+        asset, image_size = get_test_thumbnail_asset()
+        tags = (
+            "{% script 'http://www.example.com/example.js' data=value %}"
+            "{% stylesheet 'http://www.example.com/example.css' media=value %}"
+            "{% img asset alt=value %}"
+        )
+        template = Template("{% load assets %}" + tags + "{% autoescape off %}" + tags + "{% endautoescape %}")
+        context = {"asset": asset, "value": "<foo & bar>"}
+        with override_settings(OPTIMIZATIONS_FAST_TEMPLATE_TAGS=False):
+            html = template.render(Context(context))
+            autoescape_off_html = template.render(Context(context, autoescape=False))
+        self.assertIn("&lt;foo &amp; bar&gt;", html)
+        self.assertIn("<foo & bar>", html)
+        self.assertNotIn("&lt;", autoescape_off_html)
+        with override_settings(OPTIMIZATIONS_FAST_TEMPLATE_TAGS=True):
+            self.assertEqual(template.render(Context(context)), html)
+            self.assertEqual(template.render(Context(context, autoescape=False)), autoescape_off_html)
+
+    def testInclusionTagTemplate(self):
+        asset, image_size = get_test_thumbnail_asset()
+        template = Template(
+            "{% load assets %}"
+            "{% img asset alt=alt %}"
+            "{% autoescape off %}{% img asset alt=alt %}{% endautoescape %}"
+        )
+        with override_settings(OPTIMIZATIONS_FAST_TEMPLATE_TAGS=False):
+            html = template.render(Context({"asset": asset, "alt": "foo & bar"}))
+            # The parent context's autoescape setting is respected.
+            self.assertIn('alt="foo &amp; bar"', html)
+            self.assertIn('alt="foo & bar"', html)
+            # The template is loaded once per node.
+            node = template.nodelist.get_nodes_by_type(InclusionNode)[0]
+            inclusion_template = node._template
+            self.assertNotEqual(inclusion_template, None)
+            self.assertEqual(template.render(Context({"asset": asset, "alt": "foo & bar"})), html)
+            self.assertIs(node._template, inclusion_template)
@@ -1,12 +1,16 @@
 """Tests for the asset cache."""
 
 import hashlib
+from io import BytesIO
+
+from PIL import Image
 
 from django.test import TestCase
+from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 
-from optimizations.assetcache import default_asset_cache
-from optimizations.thumbnailcache import default_thumbnail_cache
+from optimizations.assetcache import default_asset_cache, load_recipe, FileAsset
+from optimizations.thumbnailcache import default_thumbnail_cache, open_image, ThumbnailError
 from test_optimizations.tests.base import get_test_thumbnail_asset
 
 
@@ -75,3 +79,65 @@ class ThumbnailCacheTest(TestCase):
         self.assertEqual(thumbnail.height, height)
         # Make sure the file contents are not identical.
         self.assertEqual(hashlib.sha1(default_storage.open(default_asset_cache.get_name(asset)).read()).hexdigest(), hashlib.sha1(default_storage.open(default_asset_cache.get_name(thumbnail._asset)).read()).hexdigest())
+
+    def testImageLimits(self):
+        asset, image_size = get_test_thumbnail_asset()
+        width, height = image_size
+        with self.settings(OPTIMIZATIONS_THUMBNAIL_MAX_PIXELS=width * height - 1):
+            self.assertRaises(ThumbnailError, open_image, asset)
+        with self.settings(OPTIMIZATIONS_THUMBNAIL_MAX_BYTES=1):
+            self.assertRaises(ThumbnailError, open_image, asset)
+        with self.settings(OPTIMIZATIONS_THUMBNAIL_MAX_PIXELS=width * height):
+            self.assertEqual(open_image(asset).size, image_size)
+
+    def testImageCacheSmartCrop(self):
+        asset, image_size = get_test_thumbnail_asset()
+        width, height = image_size
+        width /= 3
+        height /= 2
+        for method in ("crop_entropy", "crop_edges"):
+            thumbnail = default_thumbnail_cache.get_thumbnail(asset, width, height, method)
+            self.assertEqual(thumbnail.width, width)
+            self.assertEqual(thumbnail.height, height)
+
+    def testImageCacheFocalPoint(self):
+        asset, image_size = get_test_thumbnail_asset()
+        width, height = image_size
+        width /= 3
+        height /= 2
+        centered_thumbnail = default_thumbnail_cache.get_thumbnail(asset, width, height, "crop")
+        thumbnail = default_thumbnail_cache.get_thumbnail(asset, width, height, "crop", focal_point="0,0")
+        self.assertEqual(thumbnail.width, width)
+        self.assertEqual(thumbnail.height, height)
+        # The focal point is part of the asset id.
+        self.assertEqual(thumbnail._asset.get_id(), default_thumbnail_cache.get_thumbnail(asset, width, height, "crop", focal_point=(0, 0))._asset.get_id())
+        self.assertNotEqual(thumbnail._asset.get_id(), centered_thumbnail._asset.get_id())
+        # Methods that don't crop ignore the focal point.
+        for method in ("proportional", "resize"):
+            self.assertEqual(
+                default_thumbnail_cache.get_thumbnail(asset, width, height, method, focal_point="0,0")._asset.get_id(),
+                default_thumbnail_cache.get_thumbnail(asset, width, height, method)._asset.get_id(),
+            )
+        # Invalid focal points are rejected.
+        self.assertRaises(ValueError, default_thumbnail_cache.get_thumbnail, asset, width, height, "crop", focal_point="2,0")
+        self.assertRaises(ValueError, default_thumbnail_cache.get_thumbnail, asset, width, height, "crop", focal_point="foo")
+
+    def testImageCacheUnreducibleModes(self):
+        for mode in ("P", "1"):
+            buffer = BytesIO()
+            Image.new(mode, (2000, 2000)).save(buffer, "PNG")
+            name = default_storage.save("thumbnail_tests/{mode}.png".format(mode=mode), ContentFile(buffer.getvalue()))
+            try:
+                asset = FileAsset(default_storage.open(name))
+                for method in ("proportional", "crop"):
+                    thumbnail = default_thumbnail_cache.get_thumbnail(asset, 100, 100, method)
+                    self.assertEqual(thumbnail.width, 100)
+                    self.assertEqual(thumbnail.height, 100)
+                    self.assertEqual(Image.open(default_storage.open(default_asset_cache.get_name(thumbnail._asset))).size, (100, 100))
+            finally:
+                default_storage.delete(name)
+
+    def testThumbnailRecipe(self):
+        asset, image_size = get_test_thumbnail_asset()
+        thumbnail = default_thumbnail_cache.get_thumbnail(asset, 10, 10, "crop", focal_point="0.5,0.25")
+        self.assertEqual(load_recipe(thumbnail._asset.get_recipe()).get_id(), thumbnail._asset.get_id())